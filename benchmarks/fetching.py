@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate import Dataset, generate
+from stages import serve_directory
+from tge import nodes_to_assignments as stage_1
+
+
+def fetch_config(dataset: Dataset, work_dir: str, nodes_csv_file: str, config) -> argparse.Namespace:
+    return argparse.Namespace(
+        nodes_csv_file=nodes_csv_file,
+        claims_output_dir=os.path.join(work_dir, 'claims'),
+        limit=0,
+        download_workers=int(config.download_workers),
+        extract_workers=int(config.extract_workers))
+
+
+def fetch_serially(config, stats):
+    # Every phase runs to completion before the next one starts
+    stage_1.download_all_participants(config, stats)
+    stage_1.decompress_all_in_path(config.claims_output_dir, config.claims_output_dir)
+    stage_1.validate_all_claims(config, stats)
+
+
+def fetch_concurrently(config, stats):
+    asyncio.run(stage_1.fetch_all_participants(config, stats))
+
+
+def summarize(stats: dict) -> dict:
+    # What ends up mattering for the rest of stage 1, regardless of the order in which claims were processed
+    participants = stats[stage_1.PARTICIPANTS]
+    return {
+        stage: sorted(participants[stage][stage_1.WIT_IDS].difference({stage_1.UNKNOWN}))
+        for stage in stage_1.CLAIM_STAGES
+    } | {'addresses': sorted(stats[stage_1.MAPS][stage_1.WIT_ID_BY_ADDRESS].items())}
+
+
+def run(function, dataset: Dataset, work_dir: str, nodes_csv_file: str, config) -> tuple:
+    shutil.rmtree(work_dir, ignore_errors=True)
+    stage_config = fetch_config(dataset, work_dir, nodes_csv_file, config)
+    os.makedirs(stage_config.claims_output_dir)
+    stats = stage_1.init_stats()
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        function(stage_config, stats)
+
+    return time.perf_counter() - start, summarize(stats)
+
+
+def main(config):
+    dataset = Dataset(config.dataset_dir)
+    if not dataset.exists():
+        generate(dataset.output_dir, int(config.participants), int(config.seed))
+
+    work_dir = os.path.join(dataset.output_dir, 'work_fetching')
+    results = {}
+    with serve_directory(dataset.archives_dir, float(config.latency)) as base_url:
+        # Point the nodes CSV file to the local server
+        nodes_csv_file = os.path.join(dataset.output_dir, 'nodes_fetching.csv')
+        with open(dataset.nodes_csv_file) as nodes_csv:
+            nodes = nodes_csv.read()
+        with open(nodes_csv_file, 'w') as nodes_csv:
+            nodes_csv.write(nodes.replace(json.load(open(dataset.manifest))['base_url'], base_url))
+
+        summaries = {}
+        for name, function in (('serial', fetch_serially), ('pipelined', fetch_concurrently)):
+            print(f'Fetching claims {name}', file=sys.stderr)
+            seconds, summaries[name] = run(function, dataset, os.path.join(work_dir, name), nodes_csv_file, config)
+            results[name] = {'seconds': seconds}
+
+    if summaries['serial'] != summaries['pipelined']:
+        sys.exit('The pipelined fetch did not validate the same claims as the serial one')
+
+    results['validated_wit_ids'] = len(summaries['serial'][stage_1.ADDRESS])
+    results['speedup'] = results['serial']['seconds'] / results['pipelined']['seconds']
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compare downloading, decompressing and validating TIP claims one phase after the other against '
+                    'the pipelined fetch, using a local HTTP server that stands in for the real ones')
+    parser.add_argument('dataset_dir',
+                        help='dataset to use, as written by generate.py, which is generated if missing')
+    parser.add_argument('--participants', default=1000,
+                        help='how many participants to generate if the dataset is missing (default: %(default)s)')
+    parser.add_argument('--seed', default=0,
+                        help='seed for generating a missing dataset (default: %(default)s)')
+    parser.add_argument('--latency', default=0.02,
+                        help='seconds that the local server waits before answering every request, to make up for '
+                             'the lack of network (default: %(default)s)')
+    parser.add_argument('--download-workers', default=8,
+                        help='how many claim files to download at once (default: %(default)s)')
+    parser.add_argument('--extract-workers', default=4,
+                        help='how many claim archives to decompress at once (default: %(default)s)')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tarfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ecdsa
+from ecdsa.util import sigencode_der, sigencode_string
+
+from constants import GENESIS_TIMESTAMP, NANOWITS_PER_WIT
+from helpers import mkdirp, derive_address_from_public_key, compute_vesting, compute_expected_addresses, \
+    compute_amounts_batch, generate_random_string
+from tge.claiming_files_to_genesis_block import get_disclaimers_for_source
+
+WIT_ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+SOURCES_WITH_USD = ['dpa', 'ppa', 'saft']
+SOURCES_WITH_NANOWITS = ['founder', 'stakeholder', 'tip']
+
+
+class Dataset:
+    """
+    Paths of all the inputs that make up a synthetic token generation event of a given scale.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.key = os.path.join(output_dir, 'key.pem')
+        self.archives_dir = os.path.join(output_dir, 'archives')
+        self.nodes_csv_file = os.path.join(output_dir, 'nodes.csv')
+        self.kyc_file = os.path.join(output_dir, 'kyc.csv')
+        self.direct_assignment_csv_file = os.path.join(output_dir, 'direct_assignments.csv')
+        self.blocks_dir = os.path.join(output_dir, 'blocks')
+        self.assignments_dir = os.path.join(output_dir, 'assignments')
+        self.proofs_dir = os.path.join(output_dir, 'proofs')
+        self.claims_dir = os.path.join(output_dir, 'claims')
+        self.manifest = os.path.join(output_dir, 'manifest.json')
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.manifest)
+
+
+def wit_id_for(i: int) -> str:
+    digits = ''
+    for _ in range(5):
+        i, digit = divmod(i, len(WIT_ID_ALPHABET))
+        digits = WIT_ID_ALPHABET[digit] + digits
+
+    return f'WIT_{digits}'
+
+
+def generate_key(rng: random.Random) -> tuple:
+    secret = rng.randrange(1, ecdsa.SECP256k1.order)
+    signing_key = ecdsa.SigningKey.from_secret_exponent(secret, curve=ecdsa.SECP256k1, hashfunc=hashlib.sha256)
+    public_key = signing_key.get_verifying_key().to_string('compressed').hex()
+
+    return signing_key, public_key
+
+
+def generate_pem_key(dataset: Dataset):
+    # Throwaway key, only used for signing the participant proofs of the benchmark
+    subprocess.check_call(['openssl', 'ecparam', '-name', 'secp256k1', '-genkey', '-noout', '-out', dataset.key])
+
+
+def generate_tip_claim(signing_key, public_key: str, wit_id: str) -> bytes:
+    signature = signing_key.sign_deterministic(wit_id.encode('utf-8'), hashfunc=hashlib.sha256,
+                                               sigencode=sigencode_string)
+    claim = {
+        'address': derive_address_from_public_key(public_key),
+        'identifier': wit_id,
+        'public_key': public_key,
+        'signature': signature.hex(),
+    }
+
+    return json.dumps(claim, indent=4).encode('utf-8')
+
+
+def write_archive(dataset: Dataset, i: int, wit_id: str, claim: bytes) -> str:
+    # Most participants upload a zip with the claim inside a folder, some nest a tarball inside the zip
+    archive_name = f'{wit_id}_claim.zip'
+    with zipfile.ZipFile(os.path.join(dataset.archives_dir, archive_name), 'w') as archive:
+        if i % 4 == 0:
+            tarball = io.BytesIO()
+            with tarfile.open(fileobj=tarball, mode='w:gz') as inner:
+                info = tarfile.TarInfo(f'{wit_id}.txt')
+                info.size = len(claim)
+                inner.addfile(info, io.BytesIO(claim))
+            archive.writestr(f'{wit_id}_nested.tar.gz', tarball.getvalue())
+        else:
+            archive.writestr(f'claim/{wit_id}.txt', claim)
+
+    return archive_name
+
+
+def generate_stage_1(dataset: Dataset, participants: int, rng: random.Random, base_url: str):
+    mkdirp(dataset.archives_dir)
+    mkdirp(dataset.blocks_dir)
+
+    addresses = []
+    with open(dataset.nodes_csv_file, 'w') as nodes_csv, open(dataset.kyc_file, 'w') as kyc_csv, \
+            open(dataset.direct_assignment_csv_file, 'w') as direct_csv:
+        nodes_csv.write('email,wit_id,claim_file_url\n')
+        kyc_csv.write('first_name,last_name,email,nationality,wallet_address,email_match,correct_email,wit_id\n')
+        for i in range(participants):
+            wit_id = wit_id_for(i)
+            email = f'node{i}@example.tld'
+            signing_key, public_key = generate_key(rng)
+            claim = generate_tip_claim(signing_key, public_key, wit_id)
+            archive_name = write_archive(dataset, i, wit_id, claim)
+            addresses.append(derive_address_from_public_key(public_key))
+
+            nodes_csv.write(f'{email},{wit_id},{base_url}/{archive_name}\n')
+            # Around 90% of the participants pass KYC
+            if rng.random() < 0.9:
+                kyc_csv.write(f'Node,Operator {i},{email},XX,{wit_id[4:]},yes,{email},{wit_id[4:]}\n')
+            # Around 1% of the participants get a direct reward
+            if rng.random() < 0.01:
+                direct_csv.write(f'{email.upper()},{wit_id},,,,,,,,{rng.randint(1, 1000)}\n')
+
+    # Block counts are split across several files, and most mining addresses are not part of the program
+    for file_index in range(4):
+        with open(os.path.join(dataset.blocks_dir, f'blocks_{file_index}.csv'), 'w') as blocks_csv:
+            for address in addresses:
+                if rng.random() < 0.5:
+                    blocks_csv.write(f'{address},{rng.randint(1, 100)}\n')
+            for _ in range(participants):
+                outsider = derive_address_from_public_key(f'02{rng.getrandbits(256):064x}')
+                blocks_csv.write(f'{outsider},{rng.randint(1, 100)}\n')
+
+
+def generate_assignments(dataset: Dataset, participants: int, rng: random.Random) -> list:
+    mkdirp(dataset.assignments_dir)
+
+    rows = []
+    with open(os.path.join(dataset.assignments_dir, 'assignments.csv'), 'w') as assignments_csv:
+        assignments_csv.write('email_address,name,usd,nanowit,source,secret\n')
+        for i in range(participants):
+            source = rng.choice(SOURCES_WITH_USD + SOURCES_WITH_NANOWITS)
+            usd = f'{rng.randint(100, 50_000)}.{rng.randint(0, 99):02}' if source in SOURCES_WITH_USD else ''
+            nanowit = str(rng.randint(100, 50_000) * NANOWITS_PER_WIT) if source in SOURCES_WITH_NANOWITS else ''
+            row = [f'participant{i}@example.tld', f'Participant {i}', usd, nanowit, source,
+                   generate_random_string(32, rng)]
+            assignments_csv.write(','.join(row) + '\n')
+            rows.append(row)
+
+    return rows
+
+
+def generate_stage_3(dataset: Dataset, rows: list, rng: random.Random):
+    mkdirp(dataset.proofs_dir)
+    mkdirp(dataset.claims_dir)
+
+    nanowits, installments_wits = compute_amounts_batch(
+        [row[2] or 0 for row in rows], [row[3] for row in rows], [row[4] for row in rows])
+
+    for i, ((email_address, name, usd, _nanowit, source, secret), nanowit, installment_wits) \
+            in enumerate(zip(rows, nanowits, installments_wits)):
+        signing_key, public_key = generate_key(rng)
+        vesting = compute_vesting(source, nanowit, installment_wits)
+        data = {
+            'email_address': email_address,
+            'name': name,
+            'source': source,
+            'usd': float(usd or 0),
+            'wit': nanowit,
+            'vesting': vesting,
+            'genesis_date': GENESIS_TIMESTAMP,
+        }
+        # Signed with a participant key instead of the foundation one, which stage 3 does not verify anyway
+        signature = signing_key.sign_deterministic(json.dumps(data, indent=4).encode('utf8'), hashfunc=hashlib.sha256,
+                                                   sigencode=sigencode_der).hex()
+        proof = {'data': data, 'signature': signature}
+        with open(os.path.join(dataset.proofs_dir, f'{source}_{email_address}_{secret}_participant.proof'), 'w') \
+                as proof_file:
+            proof_file.write(json.dumps(proof, indent=4, ensure_ascii=False))
+            proof_file.write('\n')
+
+        disclaimers = {
+            f'{j}': {
+                'signature': signing_key.sign_deterministic(disclaimer.encode('utf-8'), hashfunc=hashlib.sha256,
+                                                            sigencode=sigencode_der).hex(),
+                'public_key': public_key,
+            } for j, disclaimer in enumerate(get_disclaimers_for_source(source))}
+        addresses = [{
+            'address': derive_address_from_public_key(f'03{hashlib.sha256(f"{i}_{k}".encode()).hexdigest()}'),
+            'amount': amount,
+            'timelock': timelock,
+        } for k, (amount, timelock) in enumerate(compute_expected_addresses(vesting, nanowit, GENESIS_TIMESTAMP))]
+        claim = {
+            'email_address': email_address,
+            'name': name,
+            'source': source,
+            'addresses': addresses,
+            'disclaimers': disclaimers,
+            'signature': signature,
+        }
+        with open(os.path.join(dataset.claims_dir, f'{email_address}.json'), 'w') as claim_file:
+            json.dump(claim, claim_file, indent=2)
+
+
+def generate(output_dir: str, participants: int, seed: int = 0, base_url: str = 'http://127.0.0.1:8000') -> Dataset:
+    dataset = Dataset(output_dir)
+    mkdirp(output_dir)
+    rng = random.Random(seed)
+
+    print(f'Generating a dataset with {participants} participants into "{output_dir}"')
+    generate_pem_key(dataset)
+    generate_stage_1(dataset, participants, rng, base_url)
+    rows = generate_assignments(dataset, participants, rng)
+    generate_stage_3(dataset, rows, rng)
+
+    with open(dataset.manifest, 'w') as manifest_file:
+        json.dump({'participants': participants, 'seed': seed, 'base_url': base_url}, manifest_file, indent=4)
+
+    return dataset
+
+
+def main(config):
+    generate(config.output_dir, int(config.participants), int(config.seed), config.base_url)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='generate synthetic but valid inputs for all the stages of a token generation event')
+    parser.add_argument('output_dir',
+                        help='where to write the dataset')
+    parser.add_argument('--participants', default=1000,
+                        help='how many participants to generate (default: %(default)s)')
+    parser.add_argument('--seed', default=0,
+                        help='seed for the random generator (default: %(default)s)')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                        help='URL from which the claim archives will be served (default: "%(default)s")')
+    args = parser.parse_args()
+    main(args)
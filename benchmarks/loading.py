@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import list_files, load_json_files
+from helpers import io as helpers_io
+
+
+def per_file_loop(directory: str, suffix: str) -> list:
+    # What the stages used to do: list with `glob`, then open and parse one file after the other
+    loaded = []
+    for path in glob.glob(f'{directory}/*{suffix}'):
+        with open(path) as json_file:
+            try:
+                loaded.append((path, json.load(json_file)))
+            except ValueError as error:
+                loaded.append((path, error))
+
+    return loaded
+
+
+def bulk(directory: str, suffix: str, workers: int) -> list:
+    return list(load_json_files(list_files(directory, suffix), workers))
+
+
+def same_results(expected: list, actual: list) -> bool:
+    # Errors cannot be compared by value, only whether each file failed or not
+    def normalize(loaded):
+        return sorted((path, None if isinstance(obj, Exception) else json.dumps(obj, sort_keys=True))
+                      for path, obj in loaded)
+
+    return normalize(expected) == normalize(actual)
+
+
+def measure(function, count: int, repeat: int) -> dict:
+    seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+
+    return {'seconds': seconds, 'files_per_second': count / seconds}
+
+
+def main(config):
+    directory, suffix, repeat = config.directory, config.suffix, int(config.repeat)
+    expected = per_file_loop(directory, suffix)
+    print(f'Loading {len(expected)} "{suffix}" files from "{directory}"', file=sys.stderr)
+
+    results = {'per_file_loop': measure(lambda: per_file_loop(directory, suffix), len(expected), repeat)}
+    for workers in [int(workers) for workers in config.workers.split(',')]:
+        if not same_results(expected, bulk(directory, suffix, workers)):
+            sys.exit(f'The bulk loader with {workers} workers does not load the same objects as the per file loop')
+        results[f'bulk_{workers}_workers'] = measure(lambda: bulk(directory, suffix, workers), len(expected), repeat)
+
+    if helpers_io.orjson is not None:
+        # Same bulk loader, but parsing with the standard library, to tell apart the gains of each part
+        orjson, helpers_io.orjson = helpers_io.orjson, None
+        try:
+            workers = int(config.workers.split(',')[-1])
+            results[f'bulk_{workers}_workers_without_orjson'] = measure(
+                lambda: bulk(directory, suffix, workers), len(expected), repeat)
+        finally:
+            helpers_io.orjson = orjson
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compare the bulk JSON file loader against opening and parsing the files one by one')
+    parser.add_argument('directory',
+                        help='directory with the files to load, e.g. the claims of a dataset from generate.py')
+    parser.add_argument('--suffix', default='.json',
+                        help='only load the files whose name ends like this (default: "%(default)s")')
+    parser.add_argument('--workers', default='1,4,16',
+                        help='comma separated list of thread pool sizes to try (default: "%(default)s")')
+    parser.add_argument('--repeat', default=5,
+                        help='how many times to repeat each measurement, keeping the best (default: %(default)s)')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ecdsa.util import sigdecode_der, sigencode_der
+
+from constants import NANOWITS_PER_WIT
+from generate import generate_key, generate_tip_claim, wit_id_for
+from helpers import validate_secp256k1_signature, derive_address_from_public_key, usd_to_nanowit, compute_vesting, \
+    compute_rate, factor, group_amount_by_powers
+from stages import ROOT_DIR, git_commit
+from tge.claiming_files_to_genesis_block import ClaimingFile, get_disclaimers_for_source
+from tge.nodes_to_assignments import validate_claim_schema
+
+EXAMPLES_DIR = os.path.join(ROOT_DIR, 'examples')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BASELINE_FILE = os.path.join(RESULTS_DIR, 'micro_baseline.json')
+
+# Sources whose amounts are given in USD, as in the example participant proof
+SOURCES_WITH_USD = ['dpa', 'ppa', 'saft']
+
+
+def load_example(file_name: str) -> dict:
+    with open(os.path.join(EXAMPLES_DIR, file_name)) as example_file:
+        return json.load(example_file)
+
+
+def build_inputs(count: int, seed: int) -> dict:
+    """
+    Inputs for every benchmark, modelled after the example participant proof and claim.
+
+    TIP claims are generated with distinct keys, and claiming files keep the amounts, addresses and signature of the
+    example claim, but with disclaimers in the current format signed for every source.
+    """
+    rng = random.Random(seed)
+    proof = load_example('2_participant_proof.json')
+    claim = load_example('3_participant_signed_claim.json')
+
+    tip_claims = []
+    disclaimer_signatures = []
+    claiming_files = []
+    for i in range(count):
+        signing_key, public_key = generate_key(rng)
+        tip_claims.append(json.loads(generate_tip_claim(signing_key, public_key, wit_id_for(i))))
+
+        source = SOURCES_WITH_USD[i % len(SOURCES_WITH_USD)]
+        disclaimers = {
+            f'{j}': {
+                'signature': signing_key.sign_deterministic(disclaimer.encode('utf-8'), hashfunc=hashlib.sha256,
+                                                            sigencode=sigencode_der).hex(),
+                'public_key': public_key,
+            } for j, disclaimer in enumerate(get_disclaimers_for_source(source))}
+        disclaimer_signatures.append((disclaimers['0']['signature'], get_disclaimers_for_source(source)[0], public_key))
+        claiming_files.append({**claim, 'source': source, 'disclaimers': disclaimers})
+
+    # Both the example amounts and the vesting installments are in wits
+    amounts = [address['amount'] * NANOWITS_PER_WIT for address in claim['addresses']] + [
+        proof['data']['wit'] * NANOWITS_PER_WIT, proof['data']['vesting']['installment_wits'] * NANOWITS_PER_WIT]
+
+    return {
+        'tip_claims': tip_claims,
+        'disclaimer_signatures': disclaimer_signatures,
+        'claiming_files': claiming_files,
+        'usds': [(proof['data']['usd'] * (1 + i % 7), source) for i, source in enumerate(SOURCES_WITH_USD * count)],
+        'amounts': amounts,
+    }
+
+
+def check_inputs(inputs: dict):
+    # Measuring the failure path of a function by mistake would make its numbers meaningless
+    for claim in inputs['tip_claims']:
+        assert validate_claim_schema(claim)
+        assert validate_secp256k1_signature(claim['signature'], claim['identifier'], claim['public_key'])
+        assert derive_address_from_public_key.__wrapped__(claim['public_key']) == claim['address']
+    for signature, message, public_key in inputs['disclaimer_signatures']:
+        assert validate_secp256k1_signature(signature, message, public_key, sigdecode=sigdecode_der)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for claiming_file in inputs['claiming_files']:
+            assert all(ClaimingFile.from_json_object(claiming_file).disclaimers)
+
+
+def define_benchmarks(inputs: dict) -> dict:
+    # Every benchmark goes once over all of its inputs, and returns how many calls that makes
+    tip_claims = inputs['tip_claims']
+    disclaimer_signatures = inputs['disclaimer_signatures']
+    claiming_files = inputs['claiming_files']
+    usds = inputs['usds']
+    amounts = inputs['amounts']
+
+    def tip_claim_signature():
+        for claim in tip_claims:
+            validate_secp256k1_signature(claim['signature'], claim['identifier'], claim['public_key'])
+        return len(tip_claims)
+
+    def disclaimer_signature():
+        for signature, message, public_key in disclaimer_signatures:
+            validate_secp256k1_signature(signature, message, public_key, sigdecode=sigdecode_der)
+        return len(disclaimer_signatures)
+
+    def derive_address():
+        # Without the cache in front of it, which would otherwise answer every call after the first round
+        for claim in tip_claims:
+            derive_address_from_public_key.__wrapped__(claim['public_key'])
+        return len(tip_claims)
+
+    def derive_address_cached():
+        for claim in tip_claims:
+            derive_address_from_public_key(claim['public_key'])
+        return len(tip_claims)
+
+    def usd_to_nanowit_and_vesting():
+        for usd, source in usds:
+            compute_vesting(source, usd_to_nanowit(usd, compute_rate(source)))
+        return len(usds)
+
+    def factor_powers_of_2():
+        for amount in amounts:
+            factor(amount, 2)
+        return len(amounts)
+
+    def factor_powers_of_10():
+        for amount in amounts:
+            factor(amount, 10)
+        return len(amounts)
+
+    def group_by_powers():
+        for amount in amounts:
+            group_amount_by_powers(amount)
+        return len(amounts)
+
+    def claim_schema():
+        for claim in tip_claims:
+            validate_claim_schema(claim)
+        return len(tip_claims)
+
+    def claiming_file_from_json_object():
+        for claiming_file in claiming_files:
+            ClaimingFile.from_json_object(claiming_file)
+        return len(claiming_files)
+
+    return {
+        'validate_secp256k1_signature/tip_claim': tip_claim_signature,
+        'validate_secp256k1_signature/disclaimer': disclaimer_signature,
+        'derive_address_from_public_key': derive_address,
+        'derive_address_from_public_key/cached': derive_address_cached,
+        'usd_to_nanowit+compute_vesting': usd_to_nanowit_and_vesting,
+        'factor/base_2': factor_powers_of_2,
+        'factor/base_10': factor_powers_of_10,
+        'group_amount_by_powers': group_by_powers,
+        'validate_claim_schema': claim_schema,
+        'ClaimingFile.from_json_object': claiming_file_from_json_object,
+    }
+
+
+def measure(function, min_time: float, repeat: int) -> dict:
+    # Calibrate how many rounds make up a measurement of at least min_time, then keep the best of several
+    calls = function()
+    rounds = 1
+    while True:
+        seconds = timeit.timeit(function, number=rounds)
+        if seconds >= min_time:
+            break
+        rounds *= 2 if seconds <= 0 else max(2, int(min_time / seconds) + 1)
+
+    seconds = min([seconds] + timeit.repeat(function, number=rounds, repeat=repeat - 1))
+    calls *= rounds
+
+    return {
+        'calls': calls,
+        'seconds': seconds,
+        'ops_per_second': calls / seconds,
+        'microseconds_per_op': seconds / calls * 1e6,
+    }
+
+
+def run(config) -> dict:
+    inputs = build_inputs(int(config.inputs), int(config.seed))
+    check_inputs(inputs)
+    benchmarks = define_benchmarks(inputs)
+    selected = [name for name in benchmarks if not config.only or any(part in name for part in config.only.split(','))]
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'results': dict(),
+    }
+    for name in selected:
+        # ClaimingFile prints every time that it is instantiated
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = measure(benchmarks[name], float(config.min_time), int(config.repeat))
+        print(f'{name:<45} {result["ops_per_second"]:>14,.1f} ops/s {result["microseconds_per_op"]:>12,.2f} us/op',
+              file=sys.stderr)
+        report['results'][name] = result
+
+    return report
+
+
+def write_report(report: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as results_file:
+        json.dump(report, results_file, indent=4)
+        results_file.write('\n')
+    print(f'Results written to {path}', file=sys.stderr)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Compare the throughput of every benchmark against the baseline.
+
+    Returns the benchmarks that dropped by more than the threshold, as a fraction of the baseline throughput.
+    Benchmarks missing from either side are reported but do not count as regressions.
+    """
+    regressions = []
+    print(f'{"benchmark":<45} {"baseline ops/s":>14} {"current ops/s":>14} {"change":>8}')
+    for name in sorted(set(baseline['results']).union(current['results'])):
+        if name not in baseline['results'] or name not in current['results']:
+            print(f'{name:<45} only in the {"baseline" if name in baseline["results"] else "current results"}')
+            continue
+
+        before = baseline['results'][name]['ops_per_second']
+        after = current['results'][name]['ops_per_second']
+        change = after / before - 1
+        regressed = change < -threshold
+        print(f'{name:<45} {before:>14,.1f} {after:>14,.1f} {change:>+8.1%}{"  REGRESSION" if regressed else ""}')
+        if regressed:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(config):
+    if config.command == 'run':
+        report = run(config)
+        write_report(report, config.output_file or os.path.join(RESULTS_DIR, f'micro_{report["commit"][:12]}.json'))
+        if config.save_baseline:
+            write_report(report, config.baseline)
+        return
+
+    with open(config.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if config.results:
+        with open(config.results) as results_file:
+            current = json.load(results_file)
+    else:
+        current = run(config)
+
+    regressions = compare(baseline, current, float(config.threshold))
+    if regressions:
+        sys.exit(f'Throughput dropped by more than {float(config.threshold):.0%} against the baseline of commit '
+                 f'{baseline["commit"][:12]} in: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='measure the throughput of the per item hot paths (signatures, addresses, amounts, claim schema '
+                    'and claiming files), save it as a baseline, and check later runs against it')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and write their results')
+    compare_parser = subparsers.add_parser(
+        'compare', help='compare results against the baseline, and fail if any benchmark got slower than allowed')
+    for subparser in (run_parser, compare_parser):
+        subparser.add_argument('--baseline', default=BASELINE_FILE,
+                               help='baseline results file (default: benchmarks/results/micro_baseline.json)')
+        subparser.add_argument('--inputs', default=32,
+                               help='how many distinct inputs every benchmark goes over (default: %(default)s)')
+        subparser.add_argument('--seed', default=0,
+                               help='seed for generating the keys of the inputs (default: %(default)s)')
+        subparser.add_argument('--min-time', default=0.2,
+                               help='minimum seconds that every measurement takes (default: %(default)s)')
+        subparser.add_argument('--repeat', default=5,
+                               help='how many times to repeat every measurement, keeping the best (default: '
+                                    '%(default)s)')
+        subparser.add_argument('--only', default=None,
+                               help='comma separated list of benchmark names, or parts of them, to run (default: all)')
+    run_parser.add_argument('--output-file', default=None,
+                            help='where to write the JSON results (default: benchmarks/results/micro_<commit>.json)')
+    run_parser.add_argument('--save-baseline', action='store_true',
+                            help='also write the results as the baseline')
+    compare_parser.add_argument('--results', default=None,
+                                help='results file to compare, as written by the run command (default: run the '
+                                     'benchmarks now)')
+    compare_parser.add_argument('--threshold', default=0.1,
+                                help='largest drop in throughput allowed for any benchmark, as a fraction of the '
+                                     'baseline (default: %(default)s)')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import WIT_PRECISION
+from helpers import factor, group_amount_by_unlocked_date
+
+JS_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'validate_claiming_file_script.js')
+
+# Largest amount that the JS reference can represent exactly
+MAX_JS_SAFE_INTEGER = 2 ** 53 - 1
+
+
+def generate_amounts(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    amounts = [0, 1, WIT_PRECISION - 1, WIT_PRECISION, WIT_PRECISION + 1, 2 * WIT_PRECISION, MAX_JS_SAFE_INTEGER]
+    while len(amounts) < count:
+        amounts.append(rng.choice([
+            # Tiny amounts, below the minimum
+            rng.randint(1, WIT_PRECISION),
+            # Exact powers of two and their neighbours
+            2 ** rng.randint(0, 52) + rng.randint(-1, 1),
+            # Multiples of the minimum
+            rng.randint(1, 2 ** 29) * WIT_PRECISION,
+            # Anything up to the JS safe integer limit
+            rng.randint(1, MAX_JS_SAFE_INTEGER),
+        ]))
+
+    return amounts
+
+
+def js_reference(amounts: list) -> list:
+    # Pull the decomposition functions out of the validation script, which cannot be `require`d because it runs on load
+    source = open(JS_SCRIPT_PATH).read()
+    constant = re.search(r'const CLAIMING_ADDRESS_MIN_NANOWITS = .*', source).group(0)
+    functions = source[source.index('function groupAmountByUnlockedDate'):source.index('function validateFile')]
+    program = f'''{constant}
+{functions}
+const amounts = JSON.parse(require('fs').readFileSync(0))
+console.log(JSON.stringify(amounts.map(amount => groupAmountByUnlockedDate(amount))))
+'''
+    stdout = subprocess.check_output(['node', '-e', program], input=json.dumps(amounts).encode('utf8'))
+
+    return json.loads(stdout)
+
+
+def reference_factor(amount: int, base: int = 10, exp=100) -> list:
+    # The former recursive implementation, kept here as a baseline
+    if amount == 0:
+        return []
+
+    power = base ** exp
+
+    if WIT_PRECISION > amount:
+        return [WIT_PRECISION]
+
+    if power > amount:
+        return reference_factor(amount, base, exp - 1)
+
+    return [power] + reference_factor(amount - power, base, exp)
+
+
+def check(amounts: list) -> int:
+    print(f'Checking {len(amounts)} amounts against "{JS_SCRIPT_PATH}"')
+    mismatches = 0
+    for amount, expected in zip(amounts, js_reference(amounts)):
+        if group_amount_by_unlocked_date(amount) != expected:
+            print(f'\tMismatch for {amount}: expected {expected}, got {group_amount_by_unlocked_date(amount)}')
+            mismatches += 1
+
+    for base in (2, 10):
+        for amount in amounts:
+            if factor(amount, base) != reference_factor(amount, base):
+                print(f'\tMismatch for {amount} in base {base} against the recursive implementation')
+                mismatches += 1
+
+    print(f'Found {mismatches} mismatches')
+
+    return mismatches
+
+
+def bench(amounts: list, repeat: int) -> dict:
+    results = {}
+    for base in (2, 10):
+        for name, function in (('factor', factor), ('reference_factor', reference_factor)):
+            seconds = min(timeit.repeat(lambda: [function(amount, base) for amount in amounts], number=1,
+                                        repeat=repeat))
+            results[f'{name}_base_{base}'] = {
+                'seconds': seconds,
+                'amounts_per_second': len(amounts) / seconds,
+            }
+
+    return results
+
+
+def main(config):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+    amounts = generate_amounts(int(config.count), int(config.seed))
+
+    if config.check and check(amounts) != 0:
+        sys.exit(1)
+
+    print(json.dumps(bench(amounts, int(config.repeat)), indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='benchmark the decomposition of amounts into powers, and check it against the JS reference')
+    parser.add_argument('--count', default=10_000,
+                        help='how many random amounts to decompose (default: %(default)s)')
+    parser.add_argument('--seed', default=0,
+                        help='seed for generating the random amounts (default: %(default)s)')
+    parser.add_argument('--repeat', default=5,
+                        help='how many times to repeat each measurement, keeping the best (default: %(default)s)')
+    parser.add_argument('--check', action='store_true',
+                        help='verify the results against validate_claiming_file_script.js before benchmarking')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import functools
+import http.server
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate import Dataset, generate
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = {
+    1: 'tge.nodes_to_assignments',
+    2: 'tge.assignments_to_participant_proofs',
+    3: 'tge.claiming_files_to_genesis_block',
+}
+
+# The functions of each stage that get timed separately, in the order in which they run
+PHASES = {
+    1: ['download_all_participants', 'decompress_all_in_path', 'validate_all_claims', 'load_kyc',
+        'load_all_blocks_counts', 'load_all_direct_assignments', 'compute_all_rewards', 'write_assignments',
+        'write_table', 'write_stats'],
+    2: ['process_all_assignment_files', 'process_participants'],
+    3: ['process_all_participant_proof_files', 'process_all_claim_files', 'serialize_genesis_block'],
+}
+
+
+class PhaseTimer:
+    """
+    Replaces functions in a stage module with wrappers that accumulate how long each of them takes.
+    """
+
+    def __init__(self, module, phases: list):
+        self.module = module
+        self.seconds = {}
+        for phase in phases:
+            setattr(module, phase, self.wrap(phase, getattr(module, phase)))
+
+    def wrap(self, phase: str, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[phase] = self.seconds.get(phase, 0) + time.perf_counter() - start
+
+        return timed
+
+
+@contextlib.contextmanager
+def serve_directory(directory: str, latency: float = 0):
+    # Serve the claim archives over HTTP so that the download phase does not need the network
+    handler = functools.partial(QuietHandler, directory=directory, latency=latency)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, latency: float = 0, **kwargs):
+        self.latency = latency
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        # Optionally pretend to be a remote server
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, *_args):
+        pass
+
+
+def stage_config(stage: int, dataset: Dataset, work_dir: str) -> argparse.Namespace:
+    if stage == 1:
+        return argparse.Namespace(
+            nodes_csv_file=dataset.nodes_csv_file,
+            direct_assignment_csv_file=dataset.direct_assignment_csv_file,
+            kyc_file=dataset.kyc_file,
+            claims_output_dir=os.path.join(work_dir, 'claims'),
+            blocks_dir=dataset.blocks_dir,
+            output_file=os.path.join(work_dir, 'tip.csv'),
+            limit=0,
+            fetch_claims=False,
+            download_workers=8,
+            extract_workers=4,
+            program_blocks_only=True,
+            participants_file=os.path.join(work_dir, 'participants.json'),
+            stats_file=os.path.join(work_dir, 'stats.json'),
+            results_file=os.path.join(work_dir, 'results.ndjson'),
+            results_format='ndjson')
+    if stage == 2:
+        return argparse.Namespace(
+            assignments_dir=dataset.assignments_dir,
+            output_dir=os.path.join(work_dir, 'proofs'),
+            key=dataset.key,
+            preview_schedules=False,
+            bundle=None,
+            resume=False)
+
+    return argparse.Namespace(
+        participant_proofs_dir=dataset.proofs_dir,
+        claim_files_dir=dataset.claims_dir,
+        write_genesis_block=os.path.join(work_dir, 'genesis_block.json'),
+        write_manifest=None,
+        genesis_workers=4,
+        consolidate_utxos=False,
+        max_chunk_entries=0,
+        validator='python')
+
+
+def run_stage(stage: int, dataset: Dataset, work_dir: str) -> dict:
+    # Runs in its own process, so that the peak RSS belongs to this stage only
+    module = importlib.import_module(STAGES[stage])
+    timer = PhaseTimer(module, PHASES[stage])
+    config = stage_config(stage, dataset, work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if stage == 1:
+            # Downloading and decompressing are disabled in `main`, so they are run here explicitly
+            os.makedirs(config.claims_output_dir, exist_ok=True)
+            with serve_directory(dataset.archives_dir) as base_url:
+                with open(config.nodes_csv_file) as nodes_csv:
+                    nodes = nodes_csv.read()
+                config.nodes_csv_file = os.path.join(work_dir, 'nodes.csv')
+                with open(config.nodes_csv_file, 'w') as nodes_csv:
+                    nodes_csv.write(nodes.replace(json.load(open(dataset.manifest))['base_url'], base_url))
+                module.download_all_participants(config, module.init_stats())
+            module.decompress_all_in_path(config.claims_output_dir, config.claims_output_dir)
+        module.main(config)
+    seconds = time.perf_counter() - start
+
+    return {
+        'seconds': seconds,
+        'phases': timer.seconds,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_stage_in_subprocess(stage: int, dataset: Dataset, work_dir: str) -> dict:
+    shutil.rmtree(work_dir, ignore_errors=True)
+    cmd = [sys.executable, os.path.abspath(__file__), '--run-stage', str(stage), '--work-dir', work_dir,
+           dataset.output_dir]
+    stdout = subprocess.check_output(cmd, cwd=ROOT_DIR)
+
+    return json.loads(stdout.decode('utf8').splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode('utf8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(config):
+    if config.run_stage:
+        result = run_stage(int(config.run_stage), Dataset(config.datasets_dir), config.work_dir)
+        print(json.dumps(result))
+        return
+
+    stages = [int(stage) for stage in config.stages.split(',')]
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'results': [],
+    }
+
+    for scale in [int(scale) for scale in config.scales.split(',')]:
+        dataset = Dataset(os.path.join(config.datasets_dir, f'{scale}'))
+        if not dataset.exists():
+            generate(dataset.output_dir, scale, int(config.seed))
+
+        for stage in stages:
+            print(f'Running stage {stage} with {scale} participants')
+            result = run_stage_in_subprocess(stage, dataset, os.path.join(dataset.output_dir, f'work_{stage}'))
+            result.update({
+                'stage': stage,
+                'participants': scale,
+                'participants_per_second': scale / result['seconds'],
+            })
+            print(f'\tTook {result["seconds"]:.2f}s ({result["participants_per_second"]:.1f} participants/s), '
+                  f'peak RSS was {result["peak_rss_kb"]} KiB')
+            report['results'].append(result)
+
+    output_file = config.output_file or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                                     f'stages_{commit[:12]}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, 'w') as results_file:
+        json.dump(report, results_file, indent=4)
+        results_file.write('\n')
+    print(f'Results written to {output_file}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='time every stage of the token generation event end to end and per phase on synthetic datasets')
+    parser.add_argument('datasets_dir',
+                        help='where to find or generate the datasets, one subdirectory per scale')
+    parser.add_argument('--scales', default='1000,10000,100000',
+                        help='comma separated list of participant counts (default: "%(default)s")')
+    parser.add_argument('--stages', default='1,2,3',
+                        help='comma separated list of stages to run (default: "%(default)s")')
+    parser.add_argument('--seed', default=0,
+                        help='seed for generating missing datasets (default: %(default)s)')
+    parser.add_argument('--output-file', default=None,
+                        help='where to write the JSON results (default: benchmarks/results/stages_<commit>.json)')
+    parser.add_argument('--run-stage', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = [
+    '1_nodes_to_assignments.py',
+    '2_assignments_to_participant_proofs.py',
+    '3_claiming_files_to_genesis_block.py',
+]
+
+
+def time_command(cmd: list, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call(cmd, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def slowest_imports(script: str, count: int) -> list:
+    # `-X importtime` reports the cumulative import time of every module, in microseconds, on stderr
+    cmd = [sys.executable, '-X', 'importtime', script, '--help']
+    stderr = subprocess.run(cmd, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE).stderr
+    imports = []
+    for line in stderr.decode('utf8').splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            _, cumulative, module = line[len('import time:'):].split('|')
+            imports.append({'module': module.strip(), 'cumulative_us': int(cumulative)})
+
+    return sorted(imports, key=lambda x: -x['cumulative_us'])[:count]
+
+
+def main(config):
+    repeat = int(config.repeat)
+    baseline = time_command([sys.executable, '-c', 'pass'], repeat)
+    results = {
+        'python': {
+            'min_seconds': min(baseline),
+            'median_seconds': statistics.median(baseline),
+        }
+    }
+
+    for script in SCRIPTS:
+        # Parsing `--help` imports everything the script needs and exits right before doing any work
+        timings = time_command([sys.executable, script, '--help'], repeat)
+        results[script] = {
+            'min_seconds': min(timings),
+            'median_seconds': statistics.median(timings),
+            'over_python_seconds': min(timings) - min(baseline),
+            'slowest_imports': slowest_imports(script, int(config.top)),
+        }
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='measure how long each stage script takes to start up, and which imports dominate')
+    parser.add_argument('--repeat', default=20,
+                        help='how many times to start each script (default: %(default)s)')
+    parser.add_argument('--top', default=5,
+                        help='how many of the slowest imports to report per script (default: %(default)s)')
+    args = parser.parse_args()
+    main(args)
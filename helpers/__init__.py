@@ -0,0 +1,77 @@
+"""
+Helpers shared by all the stages.
+
+They are split into submodules (amounts, archive, crypto, io and net) which are only imported the first time that one
+of their names is used, so that each stage only pays for the dependencies that it actually needs.
+"""
+import importlib
+
+SUBMODULE_BY_NAME = {
+    'RATE_BY_SOURCE': 'amounts',
+    'VESTING_BY_SOURCE': 'amounts',
+    'to_fraction': 'amounts',
+    'usd_to_nanowit_batch': 'amounts',
+    'compute_installment_wits_batch': 'amounts',
+    'compute_amounts_batch': 'amounts',
+    'usd_to_nanowit': 'amounts',
+    'compute_vesting': 'amounts',
+    'compute_rate': 'amounts',
+    'TIMELOCK_GRIDS': 'amounts',
+    'get_timelock_grid': 'amounts',
+    'calculate_vesting': 'amounts',
+    'compute_unlock_schedule': 'amounts',
+    'compute_expected_addresses': 'amounts',
+    'group_amount_by_powers': 'amounts',
+    'group_amount_by_unlocked_date': 'amounts',
+    'factor': 'amounts',
+    'decompress_all_in_path': 'archive',
+    'flatten_directory': 'archive',
+    'BECH32_CHARSET': 'crypto',
+    'BECH32_CHARSET_INDEX': 'crypto',
+    'BECH32_GENERATOR': 'crypto',
+    'BECH32_POLYMOD_TABLE': 'crypto',
+    'ADDRESS_CACHE_SIZE': 'crypto',
+    'bech32_polymod': 'crypto',
+    'bech32_hrp_polymod': 'crypto',
+    'bech32_encode_hash': 'crypto',
+    'bech32_decode_hash': 'crypto',
+    'derive_address_from_public_key': 'crypto',
+    'derive_addresses_from_public_keys': 'crypto',
+    'validate_address_string': 'crypto',
+    'validate_address': 'crypto',
+    'find_invalid_addresses': 'crypto',
+    'load_public_key_from_pem': 'crypto',
+    'validate_secp256k1_signature': 'crypto',
+    'csv_map': 'io',
+    'generate_random_string': 'io',
+    'READ_WORKERS': 'io',
+    'READ_BATCH_SIZE': 'io',
+    'ATOMIC_FILE_MODE': 'io',
+    'list_files': 'io',
+    'read_file': 'io',
+    'read_files': 'io',
+    'parse_json': 'io',
+    'load_json_files': 'io',
+    'mkdirp': 'io',
+    'sync_directory': 'io',
+    'write_file_atomically': 'io',
+    'SetEncoder': 'io',
+    'write_table': 'io',
+    'download_file': 'net',
+}
+
+
+def __getattr__(name: str):
+    submodule = SUBMODULE_BY_NAME.get(name)
+    if submodule is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'{__name__}.{submodule}'), name)
+    # Cache the value so that this function is not called again for the same name
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(SUBMODULE_BY_NAME))
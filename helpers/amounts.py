@@ -0,0 +1,200 @@
+import math
+from fractions import Fraction
+
+from constants import WIT_PRECISION, VESTING_DPA, VESTING_FOUNDERS, VESTING_PPA, VESTING_SAFT, VESTING_STAKEHOLDERS, \
+    VESTING_TIP, VESTING_NONE, RATE_DPA_WITS_PER_USD, RATE_PPA_WITS_PER_USD, RATE_SAFT_WITS_PER_USD, VESTING_FOUNDATION, \
+    NANOWITS_PER_WIT, GENESIS_TIMESTAMP
+
+
+RATE_BY_SOURCE = {
+    'dpa': Fraction(str(RATE_DPA_WITS_PER_USD)) * NANOWITS_PER_WIT,
+    'saft': Fraction(str(RATE_SAFT_WITS_PER_USD)) * NANOWITS_PER_WIT,
+    'ppa': Fraction(str(RATE_PPA_WITS_PER_USD)) * NANOWITS_PER_WIT,
+}
+
+VESTING_BY_SOURCE = {
+    'dpa': VESTING_DPA,
+    'founder': VESTING_FOUNDERS,
+    'foundation': VESTING_FOUNDATION,
+    'ppa': VESTING_PPA,
+    'saft': VESTING_SAFT,
+    'stakeholder': VESTING_STAKEHOLDERS,
+    'tip': VESTING_TIP,
+}
+
+
+def to_fraction(value) -> Fraction:
+    # Floats go through their shortest decimal representation so that `0.1` means exactly one tenth
+    if isinstance(value, float):
+        value = str(value)
+    if isinstance(value, str):
+        value = value.strip() or 0
+
+    return Fraction(value)
+
+
+def usd_to_nanowit_batch(usds: list, rates: list) -> list:
+    # Exact rational arithmetic, rounded up to a multiple of WIT_PRECISION
+    return [math.ceil(to_fraction(usd) * to_fraction(rate) / WIT_PRECISION) * WIT_PRECISION
+            for usd, rate in zip(usds, rates)]
+
+
+def compute_installment_wits_batch(sources: list, totals_nanowits: list) -> list:
+    installments = [VESTING_BY_SOURCE.get(source, VESTING_NONE)['installments'] for source in sources]
+
+    return [int(total) // count for total, count in zip(totals_nanowits, installments)]
+
+
+def compute_amounts_batch(usds: list, nanowits: list, sources: list) -> tuple:
+    """
+    Resolve the nanowit amount and the vesting installment size for a whole batch of assignment rows.
+
+    Rows whose source has an exchange rate are converted from USD, the rest keep their `nanowit` amount as is.
+    Returns a tuple with a list of nanowit amounts and a list of `installment_wits`, both in the same order as the
+    input.
+    """
+    rates = [compute_rate(source) for source in sources]
+    converted = iter(usd_to_nanowit_batch(
+        [usd for usd, rate in zip(usds, rates) if rate != 0],
+        [rate for rate in rates if rate != 0]))
+    amounts = [next(converted) if rate != 0 else int(nanowit) for nanowit, rate in zip(nanowits, rates)]
+
+    return amounts, compute_installment_wits_batch(sources, amounts)
+
+
+def usd_to_nanowit(usd: float, rate) -> int:
+    return usd_to_nanowit_batch([usd], [rate])[0]
+
+
+def compute_vesting(source: str, total_nanowits: int, installment_wits: int = None) -> dict:
+    vesting = {key: value for key, value in VESTING_BY_SOURCE.get(source, VESTING_NONE).items()
+               if key != 'installments'}
+    if installment_wits is None:
+        installment_wits = compute_installment_wits_batch([source], [total_nanowits])[0]
+    vesting['installment_wits'] = installment_wits
+
+    return vesting
+
+
+def compute_rate(source: str) -> Fraction:
+    return RATE_BY_SOURCE.get(source, Fraction(0))
+
+
+# Timelock grids, keyed by (genesis_date, delay, cliff, installment_length) and grown on demand
+TIMELOCK_GRIDS = {}
+
+
+def get_timelock_grid(genesis_date: int, delay: int, cliff: int, installment_length: int, steps: int) -> list:
+    grid = TIMELOCK_GRIDS.setdefault((genesis_date, delay, cliff, installment_length), [])
+    while len(grid) < steps:
+        grid.append(genesis_date + delay + cliff + installment_length * len(grid))
+
+    return grid[:steps]
+
+
+def calculate_vesting(vesting: dict, amount: int, genesis_date: int) -> list:
+    """
+    Compute the unlock schedule of `amount` as a list of (timelock, amount) tuples, the same way `calculateVesting`
+    does in validate_claiming_file_script.js.
+
+    Timelocks are taken from the timelock grid of the vesting schedule, so only the amounts are computed per
+    participant. The JS version adds the seconds in local time, so its timelocks may be off by up to 1h across DST
+    changes unless it runs in UTC.
+    """
+    delay = vesting['delay']
+    cliff = vesting['cliff']
+    installment_length = vesting['installment_length']
+    installment_wits = vesting['installment_wits']
+
+    # `None` stands for the NaN that JS gets out of 0 / 0, which collapses the schedule into a single step
+    cliff_steps = None
+    if installment_length != 0:
+        cliff_steps = -(-cliff // installment_length)
+    elif cliff != 0:
+        raise ValueError(f'Cannot have a cliff of {cliff} seconds with installments of 0 seconds')
+
+    if cliff_steps is None or (installment_wits == 0 and amount == 0):
+        steps = 1
+    elif installment_wits == 0:
+        raise ValueError(f'Cannot split {amount} nanowits into installments of 0 nanowits')
+    else:
+        steps = -(-amount // installment_wits) - cliff_steps or 1
+        if steps < 0:
+            raise ValueError(f'Cannot split {amount} nanowits into {steps} installments')
+
+    schedule = []
+    for index, timelock in enumerate(get_timelock_grid(genesis_date, delay, cliff, installment_length, steps)):
+        if cliff and index == 0 and amount >= installment_wits:
+            current_amount = installment_wits * cliff_steps
+            amount -= installment_wits * cliff_steps
+        else:
+            current_amount = installment_wits if amount >= installment_wits else amount
+            amount -= installment_wits
+        schedule.append((timelock, current_amount))
+
+    return schedule
+
+
+def compute_unlock_schedule(source: str, total_nanowits: int, genesis_date: int = GENESIS_TIMESTAMP) -> list:
+    return calculate_vesting(compute_vesting(source, total_nanowits), total_nanowits, genesis_date)
+
+
+def compute_expected_addresses(vesting: dict, amount: int, genesis_date: int) -> list:
+    # One (amount, timelock) pair for every address that the participant is expected to claim
+    return [(piece, timelock)
+            for timelock, unlocked in calculate_vesting(vesting, amount, genesis_date)
+            for piece in group_amount_by_unlocked_date(unlocked)]
+
+
+def group_amount_by_powers(amount: int, base: int = 10):
+    # Round up to WIT_PRECISION for the sake of privacy
+    amount = -(-int(amount) // WIT_PRECISION) * WIT_PRECISION
+
+    # Every decimal digit of the amount becomes that many copies of WIT_PRECISION * base ** exp
+    flattened = []
+    power = WIT_PRECISION
+    while amount:
+        amount, digit = divmod(amount, 10)
+        flattened.extend([power] * digit)
+        power *= base
+
+    return flattened
+
+
+def group_amount_by_unlocked_date(amount: int) -> list:
+    return factor(amount, 2)
+
+
+def factor(amount: int, base: int = 10) -> list:
+    """
+    Split `amount` into powers of `base`, largest first, the same way `factor` does in
+    validate_claiming_file_script.js.
+
+    Powers are taken greedily for as long as what is left is at least WIT_PRECISION. Any non-zero remainder below
+    that is rounded up into one last WIT_PRECISION piece.
+    """
+    powers = []
+
+    if base == 2:
+        # Peel off the highest set bit until the remainder falls below the minimum
+        while amount >= WIT_PRECISION:
+            power = 1 << (amount.bit_length() - 1)
+            powers.append(power)
+            amount ^= power
+    else:
+        power = 1
+        while power * base <= amount:
+            power *= base
+
+        # Take each power as many times as it fits (its digit), stopping as soon as the remainder is below the minimum
+        while amount >= WIT_PRECISION:
+            if power <= amount:
+                count = (amount - max(power, WIT_PRECISION)) // power + 1
+                powers.extend([power] * count)
+                amount -= power * count
+            power //= base
+
+    if amount != 0:
+        powers.append(WIT_PRECISION)
+
+    return powers
@@ -0,0 +1,70 @@
+import os
+import random
+import re
+import shutil
+
+import patoolib
+
+from helpers.io import mkdirp
+
+
+def decompress_all_in_path(input_dir: str, output_dir: str, nesting: int = 0):
+    for compressed_file in os.scandir(input_dir):
+        match = re.search("(.*)\.(tar\.gz|zip|rar|tar|7z)", compressed_file.name)
+        if match:
+            print(f'Decompressing "{compressed_file.path}". Nesting is {nesting}')
+
+            # Use a temporal folder for extracting so that we can overwrite if needed (otherwise patool freezes)
+            temp_dir = os.path.join(output_dir, 'temp')
+            temp_output_dir = os.path.join(temp_dir, f'{match.group(1)}_{nesting}')
+            print(f'\tUsing "{temp_output_dir}" as temporal output directory')
+            if os.path.exists(temp_output_dir):
+                print(f'\tDirectory "{temp_output_dir}" already existed, wiping it now')
+                shutil.rmtree(temp_output_dir)
+            mkdirp(temp_output_dir)
+
+            # Extract contents into temporal directory
+            try:
+                patoolib.extract_archive(compressed_file.path, outdir=temp_output_dir, verbosity=-1)
+            except:
+                print(f'\tCompressed file "{compressed_file.path}" seems corrupted!')
+
+            # Flatten temporal directory, so as to deal with accidental nesting
+            while True:
+                if flatten_directory(temp_output_dir):
+                    break
+
+            # Copy contents from temporal directory to the normal output directory
+            for file_name in os.listdir(temp_output_dir):
+                if file_name.endswith('.txt') and not file_name.startswith('.'):
+                    temp_file_path = os.path.join(temp_output_dir, file_name)
+                    nonce = random.randint(0, 9999)
+                    output_file_path = os.path.join(output_dir, f'{nonce:05}_{file_name}')
+                    print(f'\tCopying "{temp_file_path}" into "{output_file_path}"')
+                    shutil.copyfile(temp_file_path, output_file_path)
+
+            # Decompress recursively
+            decompress_all_in_path(temp_output_dir, output_dir, nesting + 1)
+
+            # Get rid of temporal directories
+            #shutil.rmtree(temp_dir)
+
+
+def flatten_directory(path: str) -> bool:
+    print(f'\tFlattening directory "{path}"')
+    is_flatten = True
+    for entry in os.scandir(path):
+        if entry.is_dir() and not entry.name.startswith('__'):
+            print(f'\t\tFound subdirectory "{entry.path}"')
+            is_flatten = False
+            for sub_file in os.scandir(entry.path):
+                output_path = os.path.join(path, sub_file.name)
+                print(f'\t\t\tMoving up entry from subdirectory "{sub_file.path}" to "{output_path}"')
+                if os.path.exists(output_path):
+                    print(f'\tFile "{output_path}" already existed, ignoring')
+                    continue
+                shutil.move(sub_file.path, output_path)
+
+            shutil.rmtree(entry.path)
+
+    return is_flatten
@@ -0,0 +1,117 @@
+import functools
+import hashlib
+from typing import Optional
+
+import ecdsa
+from ecdsa.util import sigdecode_string
+
+from constants import BECH32_PREFIX
+
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_CHARSET_INDEX = {char: i for i, char in enumerate(BECH32_CHARSET)}
+BECH32_GENERATOR = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+# XOR of the generator terms selected by each possible value of the top 5 bits of the checksum
+BECH32_POLYMOD_TABLE = [
+    functools.reduce(lambda acc, i: acc ^ (BECH32_GENERATOR[i] if (top >> i) & 1 else 0), range(5), 0)
+    for top in range(32)
+]
+# How many public keys or addresses to remember, as the same ones are usually submitted many times
+ADDRESS_CACHE_SIZE = 1 << 16
+
+
+def bech32_polymod(values, checksum: int = 1) -> int:
+    for value in values:
+        checksum = ((checksum & 0x1ffffff) << 5) ^ value ^ BECH32_POLYMOD_TABLE[checksum >> 25]
+
+    return checksum
+
+
+@functools.lru_cache(maxsize=None)
+def bech32_hrp_polymod(hrp: str) -> int:
+    # The checksum state after the expanded human readable part, which is the same for all addresses
+    return bech32_polymod([ord(char) >> 5 for char in hrp] + [0] + [ord(char) & 31 for char in hrp])
+
+
+def bech32_encode_hash(pkh: bytes, hrp: str = BECH32_PREFIX) -> str:
+    # A 20 bytes hash is exactly 32 groups of 5 bits, so no padding is needed
+    number = int.from_bytes(pkh[0:20], 'big')
+    data = [(number >> shift) & 31 for shift in range(155, -1, -5)]
+    checksum = bech32_polymod(data + [0] * 6, bech32_hrp_polymod(hrp)) ^ 1
+
+    return hrp + '1' + ''.join(BECH32_CHARSET[i] for i in data) \
+           + ''.join(BECH32_CHARSET[(checksum >> shift) & 31] for shift in range(25, -1, -5))
+
+
+def bech32_decode_hash(address: str, hrp: str = BECH32_PREFIX) -> Optional[bytes]:
+    # Return the 20 bytes hash encoded in the address, or None if the address or its checksum are not valid
+    if address.lower() != address and address.upper() != address:
+        return None
+
+    address = address.lower()
+    if not address.startswith(hrp + '1') or len(address) != len(hrp) + 1 + 32 + 6:
+        return None
+
+    try:
+        data = [BECH32_CHARSET_INDEX[char] for char in address[len(hrp) + 1:]]
+    except KeyError:
+        return None
+
+    if bech32_polymod(data, bech32_hrp_polymod(hrp)) != 1:
+        return None
+
+    number = 0
+    for value in data[:-6]:
+        number = (number << 5) | value
+
+    return number.to_bytes(20, 'big')
+
+
+@functools.lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def derive_address_from_public_key(public_key: str) -> str:
+    pkh = hashlib.sha256(bytes.fromhex(public_key)).digest()
+    return bech32_encode_hash(pkh)
+
+
+def derive_addresses_from_public_keys(public_keys) -> list:
+    return [derive_address_from_public_key(public_key) for public_key in public_keys]
+
+
+@functools.lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def validate_address_string(address: str) -> bool:
+    return bech32_decode_hash(address) is not None
+
+
+def validate_address(address) -> bool:
+    # Addresses come straight from claim files, so they may not even be strings, nor hashable for the cache
+    return isinstance(address, str) and validate_address_string(address)
+
+
+def find_invalid_addresses(addresses) -> list:
+    # Every string is only checked once. Any other value is invalid, and is kept as is, as it may not be hashable
+    invalid_addresses = []
+    checked = set()
+    for address in addresses:
+        if not isinstance(address, str):
+            invalid_addresses.append(address)
+        elif address not in checked:
+            checked.add(address)
+            if not validate_address_string(address):
+                invalid_addresses.append(address)
+
+    return invalid_addresses
+
+
+def load_public_key_from_pem(pem_file_path: str) -> str:
+    # Compressed public key, serialized as in the claims, of the private key in a PEM file as generated by openssl
+    with open(pem_file_path) as pem_file:
+        signing_key = ecdsa.SigningKey.from_pem(pem_file.read(), hashfunc=hashlib.sha256)
+
+    return signing_key.get_verifying_key().to_string('compressed').hex()
+
+
+def validate_secp256k1_signature(signature: str, message: str, serialized_public_key: str,
+                                 sigdecode=sigdecode_string) -> bool:
+    public_key = ecdsa.VerifyingKey.from_string(bytearray.fromhex(serialized_public_key), curve=ecdsa.SECP256k1)
+    return public_key.verify(bytearray.fromhex(signature), message.encode('utf-8'), hashfunc=hashlib.sha256,
+                             sigdecode=sigdecode)
@@ -0,0 +1,179 @@
+import csv
+import json
+import os
+import pathlib
+import random
+import string
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# How many files are read concurrently, and how many are in flight at most
+READ_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+READ_BATCH_SIZE = 1024
+
+# Permissions of the files written atomically, as temporary files are otherwise only readable by their owner
+ATOMIC_FILE_MODE = 0o644
+
+
+def csv_map(source_file_path: str, map_function, skip_header=False, delimiter=',', limit=0) -> int:
+    line_count = 0
+    offset = (1 if skip_header else 0)
+
+    with open(source_file_path) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=delimiter)
+
+        for i, row in enumerate(csv_reader):
+            # Exit loop if we have reached the limit
+            if limit != 0 and i - offset >= limit:
+                break
+
+            # Skip the first line if required
+            if not skip_header or i > 0:
+                # Apply the mapping function
+                map_function(i - offset, row)
+                line_count += 1
+
+    return line_count
+
+
+def generate_random_string(length: int = 32, rng=random):
+    # Any random.Random can stand in for the random module, for strings that can be reproduced from a seed
+    return ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+
+def list_files(directory: str, suffix: str = '', include_hidden: bool = False) -> list:
+    # A single pass over the directory, as opposed to `glob`, which also matches the pattern against every name
+    with os.scandir(directory) as entries:
+        return [entry.path for entry in entries
+                if entry.name.endswith(suffix) and (include_hidden or not entry.name.startswith('.'))]
+
+
+def read_file(path: str):
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except OSError as error:
+        return error
+
+
+def read_files(paths, workers: int = READ_WORKERS, batch_size: int = READ_BATCH_SIZE):
+    """
+    Yield (path, contents) pairs in the same order as the given paths, reading the files from a pool of threads. The
+    contents are the bytes of the file, or the OSError that was raised when reading it.
+    """
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Reading in batches keeps the number of files held in memory bounded
+        while True:
+            batch = [path for _, path in zip(range(batch_size), paths)]
+            if not batch:
+                break
+            yield from zip(batch, executor.map(read_file, batch))
+
+
+def parse_json(contents):
+    if orjson is not None:
+        try:
+            return orjson.loads(contents)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than the standard library (e.g. no integers beyond 64 bits), which has the last word
+            pass
+
+    return json.loads(contents)
+
+
+def load_json_files(paths, workers: int = READ_WORKERS, batch_size: int = READ_BATCH_SIZE):
+    """
+    Yield (path, parsed_object) pairs in the same order as the given paths, where the parsed object is replaced with
+    the exception that was raised if the file could not be read or is not valid JSON.
+    """
+    for path, contents in read_files(paths, workers, batch_size):
+        if isinstance(contents, OSError):
+            yield path, contents
+            continue
+        try:
+            yield path, parse_json(contents)
+        except ValueError as error:
+            yield path, error
+
+
+def write_table(path: str, columns: dict, table_format: str = 'ndjson'):
+    """
+    Write a table given as a dict of equally long column lists, either as newline delimited JSON (one compact object
+    per row) or, if pyarrow is available, as Parquet or as an Arrow IPC file.
+    """
+    if table_format == 'ndjson':
+        names = list(columns)
+        with open(path, 'w') as output_file:
+            for row in zip(*columns.values()):
+                output_file.write(json.dumps(dict(zip(names, row)), separators=(',', ':'), cls=SetEncoder))
+                output_file.write('\n')
+        return
+
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit(f'Writing {table_format} files requires pyarrow, try "pip install pyarrow" or use ndjson')
+
+    table = pyarrow.table({name: [sorted(x) if isinstance(x, set) else x for x in values]
+                           for name, values in columns.items()})
+    if table_format == 'parquet':
+        pyarrow.parquet.write_table(table, path)
+    elif table_format == 'arrow':
+        pyarrow.feather.write_feather(table, path, compression='uncompressed')
+    else:
+        raise ValueError(f'Unknown table format "{table_format}"')
+
+
+def mkdirp(path: str):
+    pathlib.Path(path).mkdir(parents=True, exist_ok=True)
+
+
+def sync_directory(directory: str):
+    # Makes the files created, renamed or removed in the directory survive a crash
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def write_file_atomically(path: str, contents: str, sync: bool = True):
+    # Written to a temporary file next to the final path, synced and then renamed over it, so that even after a crash
+    # the file is either missing, the previous one or complete, but never truncated. The rename itself only survives a
+    # crash once the directory is synced, which callers writing many files can do once for all of them instead
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp',
+                                     delete=False) as temp_file:
+        try:
+            os.fchmod(temp_file.fileno(), ATOMIC_FILE_MODE)
+            temp_file.write(contents)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+
+    try:
+        os.replace(temp_file.name, path)
+    except BaseException:
+        os.remove(temp_file.name)
+        raise
+
+    if sync:
+        sync_directory(directory)
+
+
+class SetEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, set):
+            return list(obj)
+        return json.JSONEncoder.default(self, obj)
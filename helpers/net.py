@@ -0,0 +1,23 @@
+import os
+
+import requests
+
+
+def download_file(url: str, output_dir: str, overwrite=True, prefix='') -> bool:
+    file_name = url.rsplit('/', 1)[1]
+    output_file_path = os.path.join(output_dir, f'{prefix}_{file_name}')
+    output_file_exists = os.path.isfile(output_file_path)
+
+    # If overwrite is False, do not try to download the file if it already exists
+    if not output_file_exists or overwrite:
+        print(f'Downloading "{file_name}" as "{output_file_path}"')
+        with open(output_file_path, 'bw+') as output_file:
+            response = requests.get(url, allow_redirects=True)
+            output_file.write(response.content)
+            # Let the caller know about the success
+            return True
+    else:
+        print(f'Omitting "{file_name}" as it already exists as "{output_file_path}"')
+
+    # Signal success if the file already existed, failure otherwise
+    return output_file_exists
@@ -0,0 +1,20 @@
+from helpers import derive_address_from_public_key, find_invalid_addresses, validate_address
+
+VALID_ADDRESS = derive_address_from_public_key('02' + '11' * 32)
+
+
+def test_valid_address():
+    assert validate_address(VALID_ADDRESS)
+    assert validate_address(VALID_ADDRESS.upper())
+
+
+def test_values_that_are_not_strings_are_invalid():
+    for address in (['twit1'], {'address': VALID_ADDRESS}, None, 42, b'twit1'):
+        assert not validate_address(address)
+
+
+def test_find_invalid_addresses_reports_anything_that_is_not_an_address():
+    addresses = [VALID_ADDRESS, 'twit1nope', [VALID_ADDRESS], VALID_ADDRESS, 'twit1nope', None, {'a': 1}]
+
+    assert find_invalid_addresses(addresses) == ['twit1nope', [VALID_ADDRESS], None, {'a': 1}]
+    assert find_invalid_addresses([VALID_ADDRESS]) == []
@@ -0,0 +1,74 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from tge import assignments_to_participant_proofs as stage_2
+
+pytestmark = pytest.mark.skipif(shutil.which('openssl') is None, reason='openssl is not available')
+
+ASSIGNMENTS = '''email_address,name,usd,nanowit,source,secret
+alice@example.com,Alice,,41863000000000,founder,aliceaaaaaaaaaaaaaaaaaaaaaaaaaaa
+bob@example.com,Bob,18023.19,,dpa,bobbbbbbbbbbbbbbbbbbbbbbbbbbbbbb
+'''
+
+
+@pytest.fixture
+def config(tmp_path):
+    assignments_dir = os.path.join(tmp_path, 'assignments')
+    os.makedirs(assignments_dir)
+    with open(os.path.join(assignments_dir, 'assignments.csv'), 'w') as assignments_file:
+        assignments_file.write(ASSIGNMENTS)
+    key = os.path.join(tmp_path, 'key.pem')
+    subprocess.check_call(['openssl', 'ecparam', '-name', 'secp256k1', '-genkey', '-noout', '-out', key])
+
+    return argparse.Namespace(assignments_dir=assignments_dir, output_dir=os.path.join(tmp_path, 'proofs'), key=key,
+                              preview_schedules=False, bundle=None, resume=False)
+
+
+def run(config) -> dict:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        _stats, proofs = stage_2.main(config)
+
+    return {os.path.basename(path): proof for path, proof in proofs}
+
+
+def test_resume_keeps_proofs_with_valid_signatures(config):
+    proofs = run(config)
+    config.resume = True
+
+    assert run(config) == proofs
+
+
+def test_resume_signs_again_proofs_with_corrupted_signatures(config):
+    proofs = run(config)
+    file_name = next(file_name for file_name in proofs if file_name.startswith('dpa_'))
+    path = os.path.join(config.output_dir, file_name)
+    for signature in (proofs[file_name]['signature'][:-8], 'ff' * 70, ''):
+        with open(path, 'w') as proof_file:
+            json.dump({**proofs[file_name], 'signature': signature}, proof_file)
+
+        config.resume = True
+        resumed = run(config)
+
+        assert resumed[file_name]['signature'] not in (signature, proofs[file_name]['signature'])
+        assert stage_2.verify_data(resumed[file_name]['data'], resumed[file_name]['signature'],
+                                   stage_2.load_public_key_from_pem(config.key))
+        assert {name: proof for name, proof in resumed.items() if name != file_name} == \
+            {name: proof for name, proof in proofs.items() if name != file_name}
+        proofs = resumed
+
+
+@pytest.mark.parametrize('bundled', [False, True])
+def test_refuses_to_mix_proofs_of_a_previous_run_without_resuming(config, bundled):
+    if bundled:
+        config.bundle = os.path.join(config.output_dir, 'proofs.sqlite')
+        os.makedirs(config.output_dir)
+    run(config)
+
+    with pytest.raises(SystemExit):
+        run(config)
@@ -0,0 +1,128 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+
+import pytest
+
+from constants import GENESIS_TIMESTAMP, NANOWITS_PER_WIT
+from helpers import compute_vesting, compute_expected_addresses
+from tge.claiming_files_to_genesis_block import validate_claiming_file, validate_claiming_file_locally
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_proof() -> dict:
+    nanowit = 1234 * NANOWITS_PER_WIT + 56789012
+    data = {
+        'email_address': 'someone@example.tld',
+        'name': 'Someone',
+        'source': 'founder',
+        'usd': 0.0,
+        'wit': nanowit,
+        'vesting': compute_vesting('founder', nanowit),
+        'genesis_date': GENESIS_TIMESTAMP,
+    }
+
+    return {'data': data, 'signature': '30' * 35}
+
+
+def make_claim(proof: dict, addresses: list) -> dict:
+    return {
+        'email_address': proof['data']['email_address'],
+        'name': proof['data']['name'],
+        'source': proof['data']['source'],
+        'addresses': [{'address': f'twit1address{i}', 'amount': amount, 'timelock': timelock}
+                      for i, (amount, timelock) in enumerate(addresses)],
+        'disclaimers': {},
+        'signature': proof['signature'],
+    }
+
+
+def expected_addresses(proof: dict) -> list:
+    data = proof['data']
+
+    return compute_expected_addresses(data['vesting'], data['wit'], data['genesis_date'])
+
+
+def validate_locally(tmp_path, proof: dict, claim: dict):
+    return validate_claiming_file_locally('proof.json', 'claim.json', participant_proof=proof, token_claim=claim)
+
+
+def validate_with_node(tmp_path, proof: dict, claim: dict):
+    proof_path, claim_path = str(tmp_path / 'proof.json'), str(tmp_path / 'claim.json')
+    with open(proof_path, 'w') as proof_file:
+        json.dump(proof, proof_file)
+    with open(claim_path, 'w') as claim_file:
+        json.dump(claim, claim_file)
+
+    return validate_claiming_file(proof_path, claim_path)
+
+
+@pytest.fixture(params=['python', 'node'])
+def validate(request, tmp_path, monkeypatch):
+    if request.param == 'node':
+        if shutil.which('node') is None:
+            pytest.skip('node is not available')
+        # The script is looked up relative to the working directory
+        monkeypatch.chdir(ROOT_DIR)
+        validator = validate_with_node
+    else:
+        validator = validate_locally
+
+    def run(proof, claim):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return validator(tmp_path, proof, claim)
+
+    return run
+
+
+def test_expected_addresses_are_accepted(validate):
+    proof = make_proof()
+    assert len(expected_addresses(proof)) > 1
+
+    assert validate(proof, make_claim(proof, expected_addresses(proof))) is not None
+
+
+def test_timelocks_up_to_1h_earlier_are_accepted_and_replaced(validate):
+    proof = make_proof()
+    expected = expected_addresses(proof)
+    claim = make_claim(proof, [(amount, timelock - 3600) for amount, timelock in expected])
+
+    validated = validate(proof, claim)
+    assert validated is not None
+    assert [address['timelock'] for address in validated['addresses']] == [timelock for _, timelock in expected]
+
+
+@pytest.mark.parametrize('shift', [0, 1800])
+def test_inflated_amount_is_rejected(validate, shift):
+    proof = make_proof()
+    addresses = [(amount, timelock - shift) for amount, timelock in expected_addresses(proof)]
+    addresses[0] = (addresses[0][0] * 1000, addresses[0][1])
+
+    assert validate(proof, make_claim(proof, addresses)) is None
+
+
+@pytest.mark.parametrize('shift', [0, 1800])
+def test_missing_addresses_are_rejected(validate, shift):
+    proof = make_proof()
+    addresses = [(amount, timelock - shift) for amount, timelock in expected_addresses(proof)]
+
+    assert validate(proof, make_claim(proof, addresses[:1])) is None
+
+
+def test_unexpected_address_is_rejected(validate):
+    proof = make_proof()
+    addresses = [(amount, timelock - 1800) for amount, timelock in expected_addresses(proof)]
+
+    assert validate(proof, make_claim(proof, addresses + [addresses[-1]])) is None
+
+
+@pytest.mark.parametrize('shift', [-1, 3601])
+def test_timelock_later_or_more_than_1h_earlier_is_rejected(validate, shift):
+    proof = make_proof()
+    addresses = expected_addresses(proof)
+    addresses[-1] = (addresses[-1][0], addresses[-1][1] - shift)
+
+    assert validate(proof, make_claim(proof, addresses)) is None
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import random
+
+import pytest
+
+from constants import WIT_PRECISION
+from tge.genesis import CHUNKS, FILE_LENGTH, FILE_SHA256, LAYOUT, LENGTH, OFFSET, PART, ROOT_HASH, SHA256, TIMELOCK, \
+    UTXOS, VALUE, compute_consolidation_savings, consolidate_utxos, diff_manifests, serialize_chunk, \
+    serialize_genesis_block, sort_utxos, split_chunks, verify_genesis_block, write_genesis_block
+
+
+def random_utxos_by_timelock(seed: int) -> dict:
+    # Few addresses, so that many UTXOs get merged, and some values that cannot be merged
+    rng = random.Random(seed)
+    addresses = [f'twit1{rng.getrandbits(160):040x}' for _ in range(20)]
+    utxos_by_timelock = dict()
+    for _ in range(rng.randint(1, 300)):
+        timelock = rng.choice([0, 1602666000, 1603875600, 1605085200])
+        value = rng.randint(1, 10 ** 6) * WIT_PRECISION if rng.random() < 0.8 else rng.randint(1, 10 ** 15)
+        utxos_by_timelock.setdefault(timelock, []).append(
+            {'address': rng.choice(addresses), 'value': value, 'timelock': timelock})
+
+    return utxos_by_timelock
+
+
+def serialized_length(utxos_by_timelock: dict, max_entries: int) -> int:
+    return sum(len(serialize_chunk(chunk).encode('utf8')) for _, chunk in split_chunks(utxos_by_timelock, max_entries))
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('max_entries', [0, 1, 7])
+def test_consolidation_savings_match_serializing_both(seed, max_entries):
+    utxos_by_timelock = random_utxos_by_timelock(seed)
+    consolidated = consolidate_utxos(utxos_by_timelock)
+
+    assert compute_consolidation_savings(utxos_by_timelock, consolidated, max_entries) == \
+        serialized_length(utxos_by_timelock, max_entries) - serialized_length(consolidated, max_entries)
+
+
+def build(tmp_path, utxos_by_timelock: dict, max_entries: int = 0) -> tuple:
+    chunks = split_chunks(sort_utxos(utxos_by_timelock), max_entries)
+    genesis_block_json, manifest = serialize_genesis_block(chunks, workers=2)
+    path = os.path.join(tmp_path, 'genesis_block.json')
+    write_genesis_block(path, genesis_block_json, manifest)
+
+    return chunks, genesis_block_json, manifest, path
+
+
+def rewrite(path: str, contents: bytes, manifest: dict):
+    # As if the manifest had been rewritten along with the file, so that only the checks on the chunks can tell
+    with open(path, 'wb') as genesis_block_file:
+        genesis_block_file.write(contents)
+    manifest[FILE_LENGTH] = len(contents)
+    manifest[FILE_SHA256] = hashlib.sha256(contents).hexdigest()
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_entries', [0, 1, 7])
+def test_genesis_block_is_the_same_as_serializing_it_at_once(tmp_path, seed, max_entries):
+    chunks, genesis_block_json, manifest, path = build(tmp_path, random_utxos_by_timelock(seed), max_entries)
+
+    assert genesis_block_json == json.dumps({'alloc': [chunk for _, chunk in chunks]}, indent=4)
+    with open(path, 'rb') as genesis_block_file:
+        assert genesis_block_file.read() == (genesis_block_json + '\n').encode('utf8')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_manifest_locates_every_chunk(tmp_path, seed):
+    chunks, genesis_block_json, manifest, path = build(tmp_path, random_utxos_by_timelock(seed), 7)
+    contents = genesis_block_json.encode('utf8')
+
+    assert len(manifest[CHUNKS]) == len(chunks)
+    for (timelock, chunk), manifest_chunk in zip(chunks, manifest[CHUNKS]):
+        serialized_chunk = contents[manifest_chunk[OFFSET]:manifest_chunk[OFFSET] + manifest_chunk[LENGTH]]
+        assert serialized_chunk == serialize_chunk(chunk).encode('utf8')
+        assert json.loads(serialized_chunk) == chunk
+        assert manifest_chunk[SHA256] == hashlib.sha256(serialized_chunk).hexdigest()
+        assert (manifest_chunk[TIMELOCK], manifest_chunk[UTXOS]) == (timelock, len(chunk))
+        assert manifest_chunk[VALUE] == sum(utxo['value'] for utxo in chunk)
+    assert manifest[UTXOS] == sum(len(chunk) for _, chunk in chunks)
+    assert manifest[FILE_LENGTH] == len(contents) + 1
+
+
+def test_verify_accepts_the_genesis_block_as_written(tmp_path):
+    _chunks, _genesis_block_json, manifest, path = build(tmp_path, random_utxos_by_timelock(0))
+
+    assert verify_genesis_block(path, manifest) == []
+
+
+def test_verify_detects_a_flipped_byte(tmp_path):
+    _chunks, genesis_block_json, manifest, path = build(tmp_path, random_utxos_by_timelock(0))
+    chunk = manifest[CHUNKS][-1]
+    contents = bytearray((genesis_block_json + '\n').encode('utf8'))
+    contents[chunk[OFFSET] + chunk[LENGTH] // 2] ^= 1
+    with open(path, 'wb') as genesis_block_file:
+        genesis_block_file.write(contents)
+    assert verify_genesis_block(path, manifest) == [FILE_SHA256, chunk[TIMELOCK]]
+
+    rewrite(path, bytes(contents), manifest)
+    assert verify_genesis_block(path, manifest) == [chunk[TIMELOCK]]
+
+
+def test_verify_detects_an_appended_byte(tmp_path):
+    _chunks, genesis_block_json, manifest, path = build(tmp_path, random_utxos_by_timelock(0))
+    contents = (genesis_block_json + '\n ').encode('utf8')
+    with open(path, 'wb') as genesis_block_file:
+        genesis_block_file.write(contents)
+    assert verify_genesis_block(path, manifest) == [FILE_LENGTH, FILE_SHA256, LAYOUT]
+
+    rewrite(path, contents, manifest)
+    assert verify_genesis_block(path, manifest) == [LAYOUT]
+
+
+def test_verify_detects_a_layout_change(tmp_path):
+    # Extra text between two chunks, with the manifest moved along so that every chunk still matches
+    _chunks, genesis_block_json, manifest, path = build(tmp_path, random_utxos_by_timelock(0))
+    assert len(manifest[CHUNKS]) > 1
+    contents = (genesis_block_json + '\n').encode('utf8')
+    position = manifest[CHUNKS][1][OFFSET]
+    extra = b'{"address": "twit1injected", "value": 1},\n'
+    for chunk in manifest[CHUNKS][1:]:
+        chunk[OFFSET] += len(extra)
+    rewrite(path, contents[:position] + extra + contents[position:], manifest)
+
+    assert verify_genesis_block(path, manifest) == [LAYOUT]
+
+
+def test_empty_genesis_block(tmp_path):
+    _chunks, genesis_block_json, manifest, path = build(tmp_path, {})
+
+    assert genesis_block_json == json.dumps({'alloc': []}, indent=4)
+    assert manifest[CHUNKS] == [] and manifest[UTXOS] == 0 and manifest[VALUE] == 0
+    assert manifest[ROOT_HASH] == hashlib.sha256(b'').hexdigest()
+    assert verify_genesis_block(path, manifest) == []
+
+
+def test_diff_reports_added_removed_and_changed_chunks(tmp_path):
+    utxos_by_timelock = random_utxos_by_timelock(0)
+    _chunks, _genesis_block_json, old, _path = build(tmp_path, utxos_by_timelock)
+    assert diff_manifests(old, old) == {'same_root_hash': True, 'added': [], 'removed': [], 'changed': []}
+
+    timelocks = sorted(utxos_by_timelock)
+    changed = dict(utxos_by_timelock)
+    removed = changed.pop(timelocks[0])
+    changed[timelocks[1]] = changed[timelocks[1]][1:]
+    changed[1700000000] = removed
+    _chunks, _genesis_block_json, new, _path = build(tmp_path, changed)
+
+    diff = diff_manifests(old, new)
+    assert not diff['same_root_hash']
+    assert diff['added'] == [{TIMELOCK: 1700000000, PART: 0}]
+    assert diff['removed'] == [{TIMELOCK: timelocks[0], PART: 0}]
+    assert [(chunk[TIMELOCK], chunk[UTXOS]) for chunk in diff['changed']] == \
+        [(timelocks[1], [len(utxos_by_timelock[timelocks[1]]), len(utxos_by_timelock[timelocks[1]]) - 1])]
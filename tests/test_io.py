@@ -0,0 +1,43 @@
+import os
+import stat
+
+import pytest
+
+from helpers import ATOMIC_FILE_MODE, sync_directory, write_file_atomically
+
+
+def test_write_file_atomically_replaces_the_file(tmp_path):
+    path = os.path.join(tmp_path, 'proof.json')
+    write_file_atomically(path, 'first')
+    write_file_atomically(path, 'second')
+
+    with open(path) as file:
+        assert file.read() == 'second'
+    assert os.listdir(tmp_path) == ['proof.json']
+
+
+def test_write_file_atomically_makes_files_readable_by_everyone(tmp_path):
+    path = os.path.join(tmp_path, 'proof.json')
+    write_file_atomically(path, '{}')
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == ATOMIC_FILE_MODE
+
+
+def test_write_file_atomically_can_leave_syncing_the_directory_to_the_caller(tmp_path):
+    path = os.path.join(tmp_path, 'proof.json')
+    write_file_atomically(path, 'first', sync=False)
+    sync_directory(str(tmp_path))
+
+    with open(path) as file:
+        assert file.read() == 'first'
+
+
+def test_write_file_atomically_leaves_no_temporary_file_behind(tmp_path):
+    path = os.path.join(tmp_path, 'proof.json')
+    write_file_atomically(path, 'first')
+    with pytest.raises(TypeError):
+        write_file_atomically(path, b'not a str')
+
+    with open(path) as file:
+        assert file.read() == 'first'
+    assert os.listdir(tmp_path) == ['proof.json']
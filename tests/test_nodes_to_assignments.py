@@ -0,0 +1,73 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+
+import ecdsa
+from ecdsa.util import sigencode_string
+
+from helpers import derive_address_from_public_key
+from tge import nodes_to_assignments as stage_1
+
+
+def make_claim(secret: int, wit_id: str) -> bytes:
+    signing_key = ecdsa.SigningKey.from_secret_exponent(secret, curve=ecdsa.SECP256k1, hashfunc=hashlib.sha256)
+    public_key = signing_key.get_verifying_key().to_string('compressed').hex()
+    signature = signing_key.sign_deterministic(wit_id.encode('utf-8'), hashfunc=hashlib.sha256,
+                                               sigencode=sigencode_string)
+
+    return json.dumps({
+        'address': derive_address_from_public_key(public_key),
+        'identifier': wit_id,
+        'public_key': public_key,
+        'signature': signature.hex(),
+    }).encode('utf-8')
+
+
+def validate_claims(claims_dir, claims_by_file_name: dict) -> dict:
+    os.makedirs(claims_dir)
+    for file_name, claim in claims_by_file_name.items():
+        with open(os.path.join(claims_dir, file_name), 'wb') as claim_file:
+            claim_file.write(claim)
+
+    stats = stage_1.init_stats()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        stage_1.validate_all_claims(argparse.Namespace(claims_output_dir=claims_dir), stats)
+
+    return stats
+
+
+def test_address_claimed_by_several_wit_ids_goes_to_the_lowest(tmp_path):
+    # Both claims are signed with the same key, so they claim the same address
+    first = make_claim(1234, 'WIT_AAAAA')
+    second = make_claim(1234, 'WIT_BBBBB')
+
+    for i, claims_by_file_name in enumerate((
+            {'WIT_AAAAA_0.txt': first, 'WIT_BBBBB_1.txt': second},
+            {'WIT_BBBBB_0.txt': second, 'WIT_AAAAA_1.txt': first})):
+        stats = validate_claims(os.path.join(tmp_path, f'{i}'), claims_by_file_name)
+
+        assert stats[stage_1.PARTICIPANTS][stage_1.SIGNATURE][stage_1.WIT_IDS] == {'WIT_AAAAA', 'WIT_BBBBB'}
+        assert stats[stage_1.PARTICIPANTS][stage_1.ADDRESS][stage_1.WIT_IDS] == {'WIT_AAAAA'}
+        assert set(stats[stage_1.MAPS][stage_1.WIT_ID_BY_ADDRESS].values()) == {'WIT_AAAAA'}
+
+
+def test_extracted_claim_files_are_namespaced_and_never_overwritten(tmp_path):
+    claims_dir = os.path.join(tmp_path, 'claims')
+    os.makedirs(claims_dir)
+    with open(os.path.join(claims_dir, 'row_1_claim.txt'), 'wb') as claim_file:
+        claim_file.write(b'earlier')
+
+    claim_file_paths = []
+    for i in (0, 1):
+        staging_dir = os.path.join(tmp_path, f'staging_{i}')
+        os.makedirs(staging_dir)
+        with open(os.path.join(staging_dir, 'claim.txt'), 'wb') as claim_file:
+            claim_file.write(f'{i}'.encode('utf-8'))
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            claim_file_paths += stage_1.extract_participant_claims(staging_dir, claims_dir, f'row_{i}')
+
+    assert claim_file_paths == [os.path.join(claims_dir, 'row_0_claim.txt')]
+    with open(os.path.join(claims_dir, 'row_1_claim.txt'), 'rb') as claim_file:
+        assert claim_file.read() == b'earlier'
@@ -0,0 +1,43 @@
+from tge.participants import EMAIL_FIELD, EMAILS_FIELD, WIT_ID_BY_EMAIL, add_participant, add_kyc_row, find_by_email, \
+    init_index, set_email
+
+
+def test_a_wit_id_that_passed_kyc_again_keeps_all_its_emails():
+    index = init_index()
+    add_kyc_row(index, 'Alice', '', 'First@example.com', '', '', '', '', 'AAAAA')
+    add_kyc_row(index, 'Alice', 'Smith', '', '', '', '', 'second@example.com', 'AAAAA')
+    add_kyc_row(index, 'Alice', 'Smith', 'first@example.com ', '', '', '', '', 'AAAAA')
+
+    participant = find_by_email(index, 'second@example.com')
+    assert participant is find_by_email(index, 'first@example.com')
+    assert participant[EMAIL_FIELD] == 'first@example.com'
+    assert participant[EMAILS_FIELD] == ['first@example.com', 'second@example.com']
+
+
+def test_set_email_moves_the_participant_to_the_new_email():
+    index = init_index()
+    add_participant(index, 'WIT_AAAAA', 'kyc@example.com', 'Alice')
+    set_email(index, 'WIT_AAAAA', ' Signup@Example.com ')
+    set_email(index, 'WIT_AAAAA', 'other@example.com')
+
+    # The KYC email still leads to the participant, but the former signup email does not
+    assert find_by_email(index, 'other@example.com')[EMAIL_FIELD] == 'other@example.com'
+    assert find_by_email(index, 'kyc@example.com')[EMAIL_FIELD] == 'other@example.com'
+    assert find_by_email(index, 'signup@example.com') is None
+    assert index[WIT_ID_BY_EMAIL] == {'kyc@example.com': 'WIT_AAAAA', 'other@example.com': 'WIT_AAAAA'}
+
+
+def test_set_email_keeps_the_former_email_of_another_participant():
+    index = init_index()
+    add_participant(index, 'WIT_AAAAA', 'shared@example.com', 'Alice')
+    add_participant(index, 'WIT_BBBBB', 'shared@example.com', 'Bob')
+    set_email(index, 'WIT_BBBBB', 'bob@example.com')
+
+    assert index[WIT_ID_BY_EMAIL] == {'shared@example.com': 'WIT_AAAAA', 'bob@example.com': 'WIT_BBBBB'}
+
+
+def test_set_email_ignores_unknown_participants():
+    index = init_index()
+    set_email(index, 'WIT_AAAAA', 'alice@example.com')
+
+    assert index[WIT_ID_BY_EMAIL] == {}
@@ -0,0 +1,121 @@
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from constants import WIT_PRECISION
+from helpers import factor, group_amount_by_powers, group_amount_by_unlocked_date
+
+JS_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'validate_claiming_file_script.js')
+
+# Largest amount that the JS implementation can represent exactly
+MAX_JS_SAFE_INTEGER = 2 ** 53 - 1
+
+EDGE_CASES = sorted({0, 1, WIT_PRECISION - 1, WIT_PRECISION, WIT_PRECISION + 1, 2 * WIT_PRECISION, 10 ** 7,
+                     MAX_JS_SAFE_INTEGER, MAX_JS_SAFE_INTEGER - WIT_PRECISION}
+                    | {2 ** exp + delta for exp in range(53) for delta in (-1, 0, 1)}
+                    | {10 ** exp + delta for exp in range(16) for delta in (-1, 0, 1)}
+                    | {WIT_PRECISION * 10 ** exp for exp in range(9)})
+
+
+def random_amounts(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [rng.choice([
+        rng.randint(1, WIT_PRECISION),
+        2 ** rng.randint(0, 52) + rng.randint(-1, 1),
+        rng.randint(1, 2 ** 29) * WIT_PRECISION,
+        rng.randint(1, MAX_JS_SAFE_INTEGER),
+    ]) for _ in range(count)]
+
+
+AMOUNTS = [amount for amount in EDGE_CASES + random_amounts(2000, 0) if amount >= 0]
+
+
+def run_js(program: str, data):
+    # Pull the decomposition functions out of the validation script, which cannot be `require`d because it runs on load
+    source = open(JS_SCRIPT_PATH).read()
+    constant = re.search(r'const CLAIMING_ADDRESS_MIN_NANOWITS = .*', source).group(0)
+    functions = source[source.index('function groupAmountByUnlockedDate'):source.index('function validateFile')]
+    program = f'''{constant}
+{functions}
+const data = JSON.parse(require('fs').readFileSync(0))
+console.log(JSON.stringify({program}))
+'''
+    return json.loads(subprocess.check_output(['node', '-e', program], input=json.dumps(data).encode('utf8')))
+
+
+@pytest.fixture(scope='module')
+def js():
+    if shutil.which('node') is None:
+        pytest.skip('node is not available')
+
+    return {
+        'group_amount_by_unlocked_date': run_js('data.map(amount => groupAmountByUnlockedDate(amount))', AMOUNTS),
+        'factor_base_2': run_js('data.map(amount => factor(amount, 2))', AMOUNTS),
+        'factor_base_10': run_js('data.map(amount => factor(amount, 10))', AMOUNTS),
+    }
+
+
+def test_group_amount_by_unlocked_date_matches_js(js):
+    mismatches = [amount for amount, expected in zip(AMOUNTS, js['group_amount_by_unlocked_date'])
+                  if group_amount_by_unlocked_date(amount) != expected]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize('base', [2, 10])
+def test_factor_matches_js(js, base):
+    mismatches = [amount for amount, expected in zip(AMOUNTS, js[f'factor_base_{base}'])
+                  if factor(amount, base) != expected]
+    assert mismatches == []
+
+
+def is_power(number: int, base: int) -> bool:
+    while number % base == 0:
+        number //= base
+
+    return number == 1
+
+
+@pytest.mark.parametrize('base', [2, 10])
+@pytest.mark.parametrize('amount', EDGE_CASES + [10 ** 30, 2 ** 80 + 12345])
+def test_factor_covers_the_amount_with_powers(base, amount):
+    powers = factor(amount, base)
+
+    # Greedy powers of the base, largest first, and then one minimum piece for any remainder below the minimum
+    if powers and powers[-1] == WIT_PRECISION and not is_power(WIT_PRECISION, base):
+        powers = powers[:-1]
+    assert all(is_power(power, base) for power in powers)
+    assert powers == sorted(powers, reverse=True)
+    assert 0 <= sum(factor(amount, base)) - amount < WIT_PRECISION
+
+
+def reference_group_amount_by_powers(amount: int, base: int = 10) -> list:
+    # The original implementation, which is exact for amounts that are safe integers
+    if amount % WIT_PRECISION != 0:
+        amount = math.trunc(math.ceil(amount / WIT_PRECISION) * WIT_PRECISION)
+
+    groups = [[WIT_PRECISION * base ** exp] * int(x) for (exp, x) in enumerate(list(str(int(amount)))[::-1])]
+
+    return [x for y in groups for x in y]
+
+
+def test_group_amount_by_powers_matches_the_original_implementation():
+    mismatches = [amount for amount in AMOUNTS if amount <= MAX_JS_SAFE_INTEGER
+                  and group_amount_by_powers(amount) != reference_group_amount_by_powers(amount)]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize('amount', EDGE_CASES + [10 ** 30, 2 ** 80 + 12345])
+def test_group_amount_by_powers_rounds_up_to_the_precision(amount):
+    # Every decimal digit of the rounded amount becomes that many copies of WIT_PRECISION times its power of 10
+    rounded = -(-amount // WIT_PRECISION) * WIT_PRECISION
+    pieces = group_amount_by_powers(amount)
+
+    assert sum(pieces) == rounded * WIT_PRECISION
+    assert all(piece % WIT_PRECISION == 0 and is_power(piece // WIT_PRECISION, 10) for piece in pieces)
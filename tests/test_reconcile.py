@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+
+import pytest
+
+from helpers import SetEncoder
+from tge import nodes_to_assignments as stage_1
+from tge import reconcile
+from tge.participants import add_participant, init_index, save_index, set_email
+from tge.genesis import manifest_path_for, serialize_genesis_block, write_genesis_block, write_manifest
+
+EMAIL_BY_WIT_ID = {
+    'WIT_00001': 'a@example.com',
+    'WIT_00002': 'b@example.com',
+    'WIT_00003': 'c@example.com',
+    'WIT_00004': 'd@example.com',
+}
+
+ASSIGNMENTS = '''email_address,name,usd,nanowit,source,secret
+a@example.com,A,,100,tip,secret
+b@example.com,B,,200,tip,secret
+e@example.com,E,10.5,,dpa,secret
+f@example.com,F,,500,dpa,secret
+'''
+
+PROOFS = [('tip', 'a@example.com', 100), ('tip', 'b@example.com', 200), ('dpa', 'e@example.com', 1000),
+          ('dpa', 'F@example.com', 500)]
+
+# Address 1 is claimed under both sources, and address 4 is in the genesis block without being claimed. B claimed
+# without any address
+CLAIMS = [('tip', 'a@example.com', [('twit1address1', 100)]), ('tip', 'b@example.com', []),
+          ('dpa', 'e@example.com', [('twit1address2', 600), ('twit1address3', 400)]),
+          ('dpa', 'g@example.com', [('twit1address1', 100)])]
+
+GENESIS = {0: [('twit1address1', 100), ('twit1address2', 600)], 1602666000: [('twit1address3', 400)],
+           1603875600: [('twit1address4', 50)]}
+
+
+def write_json(path: str, contents: dict):
+    with open(path, 'w') as json_file:
+        json.dump(contents, json_file, cls=SetEncoder)
+
+
+@pytest.fixture
+def config(tmp_path):
+    stats = stage_1.init_stats()
+    for step, wit_ids in ((stage_1.FROM_CSV, EMAIL_BY_WIT_ID),
+                          (stage_1.DOWNLOADED, ['WIT_00001', 'WIT_00002', 'WIT_00003']),
+                          (stage_1.PARSED, ['WIT_00001', 'WIT_00002', stage_1.UNKNOWN]),
+                          (stage_1.SIGNATURE, ['WIT_00001', 'WIT_00002']),
+                          (stage_1.KYC, ['WIT_00001', 'WIT_00002'])):
+        stats[stage_1.PARTICIPANTS][step][stage_1.WIT_IDS].update(wit_ids)
+    stats[stage_1.MAPS][stage_1.EMAIL_BY_WIT_ID].update(EMAIL_BY_WIT_ID)
+    stats_file = os.path.join(tmp_path, 'stats.json')
+    write_json(stats_file, stats)
+
+    assignments_dir = os.path.join(tmp_path, 'assignments')
+    os.makedirs(assignments_dir)
+    with open(os.path.join(assignments_dir, 'assignments.csv'), 'w') as assignments_file:
+        assignments_file.write(ASSIGNMENTS)
+
+    proofs_dir = os.path.join(tmp_path, 'proofs')
+    os.makedirs(proofs_dir)
+    for i, (source, email, wit) in enumerate(PROOFS):
+        write_json(os.path.join(proofs_dir, f'{i}.proof'),
+                   {'data': {'email_address': email, 'source': source, 'wit': wit}, 'signature': ''})
+
+    claims_dir = os.path.join(tmp_path, 'claims')
+    os.makedirs(claims_dir)
+    for i, (source, email, addresses) in enumerate(CLAIMS):
+        write_json(os.path.join(claims_dir, f'{i}.json'), {
+            'email_address': email, 'source': source,
+            'addresses': [{'address': address, 'amount': amount} for address, amount in addresses]})
+
+    genesis_block = os.path.join(tmp_path, 'genesis_block.json')
+    genesis_block_json, manifest = serialize_genesis_block([
+        (timelock, [{'address': address, 'value': value, 'timelock': timelock} for address, value in utxos])
+        for timelock, utxos in GENESIS.items()])
+    write_genesis_block(genesis_block, genesis_block_json, manifest)
+    write_manifest(manifest, manifest_path_for(genesis_block))
+
+    return argparse.Namespace(stats_file=stats_file, assignments_dir=assignments_dir, proofs=proofs_dir,
+                              claims_dir=claims_dir, genesis_block=genesis_block, participants_file=None, samples=5,
+                              output_file=None)
+
+
+def funnel_counts(funnel: dict) -> dict:
+    return {step: None if counts is None else (counts[reconcile.COUNT], counts[reconcile.LOST],
+                                               counts[reconcile.SAMPLE])
+            for step, counts in funnel.items()}
+
+
+def test_bitsets():
+    keys, position_by_key = reconcile.number_keys({'c', 'a'}, ['b', 'a'])
+    assert keys == ['a', 'b', 'c']
+
+    bitset = reconcile.to_bitset(['c', 'a', 'unknown'], position_by_key)
+    assert bitset == 0b101
+    assert reconcile.count_bitset(bitset) == 2
+    assert reconcile.bitset_members(bitset, keys, 5) == ['a', 'c']
+    assert reconcile.bitset_members(bitset, keys, 1) == ['a']
+
+
+def test_compute_funnel():
+    keys = ['a', 'b', 'c', 'd']
+    funnel = reconcile.compute_funnel([('first', 0b1111), ('skipped', None), ('second', 0b1011), ('third', 0b0110)],
+                                      keys, 1)
+
+    assert funnel_counts(funnel) == {
+        'first': (4, 0, []),
+        'skipped': None,
+        'second': (3, 1, ['c']),
+        'third': (1, 2, ['a']),
+    }
+
+
+def test_tip_funnel(config):
+    report = reconcile.reconcile(config)
+
+    assert funnel_counts(report[reconcile.SOURCE_TIP]) == {
+        reconcile.CSV: (4, 0, []),
+        reconcile.DOWNLOADED_STEP: (3, 1, ['WIT_00004']),
+        reconcile.PARSED_STEP: (2, 1, ['WIT_00003']),
+        reconcile.SIGNED: (2, 0, []),
+        reconcile.KYC_STEP: (2, 0, []),
+        reconcile.PROOF: (2, 0, []),
+        reconcile.CLAIMED: (2, 0, []),
+        reconcile.GENESIS: (1, 1, ['WIT_00002']),
+    }
+
+
+def test_tip_funnel_follows_every_email_of_the_participants(config, tmp_path):
+    # The signup email of WIT_00001 replaced the one that it passed KYC with, which is the one that it got a proof and
+    # claimed with
+    with open(config.stats_file) as stats_file:
+        stats = json.load(stats_file)
+    stats[stage_1.MAPS][stage_1.EMAIL_BY_WIT_ID]['WIT_00001'] = 'signup@example.com'
+    write_json(config.stats_file, stats)
+    assert funnel_counts(reconcile.reconcile(config)[reconcile.SOURCE_TIP])[reconcile.PROOF] == (1, 1, ['WIT_00001'])
+
+    index = init_index()
+    for wit_id, email in EMAIL_BY_WIT_ID.items():
+        add_participant(index, wit_id, email, wit_id)
+    set_email(index, 'WIT_00001', 'signup@example.com')
+    config.participants_file = os.path.join(tmp_path, 'participants.json')
+    save_index(index, config.participants_file)
+
+    funnel = funnel_counts(reconcile.reconcile(config)[reconcile.SOURCE_TIP])
+    assert {step: funnel[step] for step in reconcile.SOURCE_STEPS} == {
+        reconcile.PROOF: (2, 0, []),
+        reconcile.CLAIMED: (2, 0, []),
+        reconcile.GENESIS: (1, 1, ['WIT_00002']),
+    }
+
+
+def test_sources(config):
+    sources = reconcile.reconcile(config)['sources']
+
+    assert funnel_counts({step: sources['dpa'][step] for step in reconcile.SOURCE_STEPS}) == {
+        reconcile.PROOF: (2, 0, []),
+        reconcile.CLAIMED: (1, 1, ['f@example.com']),
+        reconcile.GENESIS: (1, 0, []),
+    }
+    values = {source: {key: sources[source][key] for key in (
+        reconcile.ASSIGNED_VALUE, reconcile.PROOF_VALUE, reconcile.CLAIMED_VALUE, reconcile.GENESIS_VALUE,
+        reconcile.UNCLAIMED_VALUE)} for source in sources}
+    # Address 1 only has the value of a single claim in the genesis block, which goes to the first source claiming it
+    assert values == {
+        'dpa': {reconcile.ASSIGNED_VALUE: 500, reconcile.PROOF_VALUE: 1500, reconcile.CLAIMED_VALUE: 1100,
+                reconcile.GENESIS_VALUE: 1100, reconcile.UNCLAIMED_VALUE: 400},
+        'tip': {reconcile.ASSIGNED_VALUE: 300, reconcile.PROOF_VALUE: 300, reconcile.CLAIMED_VALUE: 100,
+                reconcile.GENESIS_VALUE: 0, reconcile.UNCLAIMED_VALUE: 300},
+    }
+
+
+def test_genesis_totals(config):
+    report = reconcile.reconcile(config)
+
+    assert report[reconcile.GENESIS] == {
+        'addresses': 4,
+        'value': 1150,
+        'unclaimed_addresses': 1,
+        'unclaimed_addresses_sample': ['twit1address4'],
+        'manifest_matches': True,
+    }
+    assert sum(source[reconcile.GENESIS_VALUE] for source in report['sources'].values()) + 50 == 1150
+
+
+def test_outputs_can_be_left_out(config):
+    config.stats_file = config.proofs = config.genesis_block = None
+    report = reconcile.reconcile(config)
+
+    assert reconcile.SOURCE_TIP not in report and reconcile.GENESIS not in report
+    assert report['sources']['dpa'][reconcile.PROOF] is None
+    assert report['sources']['dpa'][reconcile.GENESIS_VALUE] is None
+    assert report['sources']['dpa'][reconcile.CLAIMED_VALUE] == 1100
@@ -0,0 +1,6 @@
+"""
+Token generation event stages as an importable package.
+
+Each stage module exposes a `main(config)` that the numbered scripts in the repository root call, and that
+`tge.pipeline` chains together in a single process.
+"""
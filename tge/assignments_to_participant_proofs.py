@@ -0,0 +1,345 @@
+import binascii
+import csv
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+from ecdsa.util import sigdecode_der
+
+from constants import GENESIS_TIMESTAMP, GENESIS_TOTAL_WITS, NANOWITS_PER_WIT, TOTAL_WIT_SUPPLY
+from helpers import usd_to_nanowit, compute_vesting, compute_rate, compute_amounts_batch, \
+    calculate_vesting, mkdirp, csv_map, write_file_atomically, load_public_key_from_pem, validate_secp256k1_signature, \
+    sync_directory, list_files
+from tge.proof_bundle import count_proofs, open_bundle, read_proof, serialize_proof, write_proof
+
+# Journal of the (source, email, secret) rows whose proofs are already written, for resuming an interrupted run
+JOURNAL_FILE_NAME = '.journal.csv'
+# Rows are appended to the journal in batches, once their proofs are safely stored. Proof files are synced one by one,
+# but their directory only once per batch
+JOURNAL_BATCH_SIZE = 100
+
+JOURNAL_FILE = 'file'
+COMPLETED = 'completed'
+PENDING = 'pending'
+PUBLIC_KEY = 'public_key'
+OUTPUT_DIR = 'output_dir'
+
+
+def sign_data(data, pem_file_path) -> str:
+    data_string = json.dumps(data, indent=4)
+    # print(data_string)
+    data_bytes = data_string.encode('utf8')
+    signature_bytes = run_sign_command(data_bytes, pem_file_path)
+    signature_hex = binascii.hexlify(signature_bytes).decode('utf8')
+    return signature_hex
+
+
+# openssl commands
+#
+# Generate the private key
+# openssl ecparam -name secp256k1 -genkey
+#
+# Generate the public key
+# openssl ec -in key.pem -pubout -out key_pub.pem
+#
+# Sign file
+# openssl dgst -sha256 -sign key.pem message_to_sign.txt -outfile signature.sha256
+#
+# Verify file
+# openssl dgst -sha256 -verify key_pub.pem -signature signature.sha256 message_to_sign.txt
+
+def run_sign_command(data, pem_file_path):
+    cmd = ["openssl", "dgst", "-sha256", "-sign", pem_file_path]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    signed_data, stderr = process.communicate(input=data)
+    return signed_data
+
+
+def verify_data(data, signature_hex: str, public_key: str) -> bool:
+    # Same as `openssl dgst -sha256 -verify` over the text signed by sign_data, which openssl signs in DER
+    try:
+        return validate_secp256k1_signature(signature_hex, json.dumps(data, indent=4), public_key,
+                                            sigdecode=sigdecode_der)
+    except:
+        return False
+
+
+def init_stats() -> dict:
+    return {
+        "total": {
+            "identities": 0,
+            "wits": 0,
+            "wits_not_for_foundation": 0,
+        },
+        "dpa": {
+            "identities": 0,
+            "wits": 0,
+        },
+        "founder": {
+            "identities": 0,
+            "wits": 0,
+        },
+        "foundation": {
+            "identities": 0,
+            "wits": 0,
+        },
+        "ppa": {
+            "identities": 0,
+            "wits": 0,
+        },
+        "saft": {
+            "identities": 0,
+            "wits": 0,
+        },
+        "stakeholder": {
+            "identities": 0,
+            "wits": 0,
+        },
+        "tip": {
+            "identities": 0,
+            "wits": 0,
+        },
+    }
+
+
+def process_all_assignment_files(config, stats: dict, proofs: list, exclude=(), bundle=None, journal=None) -> int:
+    line_count = 0
+    exclude = {os.path.abspath(path) for path in exclude}
+
+    for file in os.scandir(config.assignments_dir):
+        if os.path.abspath(file.path) in exclude:
+            print(f'Skipping assignments from "{file.path}"')
+            continue
+        print(f'Reading assignments from "{file.path}"')
+        rows = []
+        line_count += csv_map(file.path, lambda i, row: rows.append(row), skip_header=True)
+        proofs.extend(process_participants(config, stats, rows, bundle, journal))
+
+    return line_count
+
+
+def parse_usd(usd) -> float:
+    try:
+        return float(usd)
+    except:
+        return 0
+
+
+def process_participants(config, stats: dict, rows: list, bundle=None, journal=None) -> list:
+    # Resolve amounts and vesting installments for all the rows at once
+    usds = [parse_usd(row[2]) for row in rows]
+    nanowits, installments_wits = compute_amounts_batch(usds, [row[3] for row in rows], [row[4] for row in rows])
+
+    return [write_participant_proof(config, stats, email_address, name, usd, nanowit, source, secret,
+                                    compute_vesting(source, nanowit, installment_wits), bundle, journal)
+            for (email_address, name, _usd, _nanowit, source, secret), usd, nanowit, installment_wits
+            in zip(rows, usds, nanowits, installments_wits)]
+
+
+def process_participant(config, stats: dict, email_address: str, name: str, usd: str, nanowit: str, source: str, secret: str,
+                        bundle=None, journal=None) -> tuple:
+    # Do integer conversions and derive wit from usd when needed
+    usd = parse_usd(usd)
+
+    rate = compute_rate(source)
+    if rate != 0:
+        nanowit = usd_to_nanowit(usd, rate)
+    else:
+        nanowit = int(nanowit)
+
+    vesting = compute_vesting(source, nanowit)
+    return write_participant_proof(config, stats, email_address, name, usd, nanowit, source, secret, vesting, bundle,
+                                   journal)
+
+
+def write_participant_proof(config, stats: dict, email_address: str, name: str, usd: float, nanowit: int, source: str,
+                            secret: str, vesting: dict, bundle=None, journal=None) -> tuple:
+    out_file_name = f'{source}_{email_address}_{secret}_participant.proof'
+    proof = {}
+    data = {
+        "email_address": email_address,
+        "name": name,
+        "source": source,
+        "usd": usd,
+        "wit": nanowit,
+        "vesting": vesting,
+        "genesis_date": GENESIS_TIMESTAMP,
+    }
+
+    row = (source, email_address, secret)
+    completed_proof = find_completed_proof(config, journal, bundle, out_file_name, row, data)
+    if bundle is None:
+        out_file_name = os.path.join(config.output_dir, out_file_name)
+
+    if completed_proof is not None:
+        print(f"\tKeeping {out_file_name}")
+        proof = completed_proof
+    else:
+        signature = sign_data(data, config.key)
+        proof["data"] = data
+        proof["signature"] = signature
+
+        if bundle is not None:
+            print(f"\tBundling {out_file_name}")
+            write_proof(bundle, out_file_name, proof)
+        else:
+            print(f"\tCreating {out_file_name}")
+            write_file_atomically(out_file_name, serialize_proof(proof), sync=journal is None)
+
+        if journal is not None:
+            record_completed_row(journal, row, bundle)
+
+    stats["total"]["wits"] += nanowit
+    stats["total"]["identities"] += 1
+    stats[source]["wits"] += nanowit
+    stats[source]["identities"] += 1
+
+    if config.preview_schedules:
+        preview_unlocks(stats, source, vesting, nanowit)
+
+    return out_file_name, proof
+
+
+def journal_path_for(config) -> str:
+    return f'{config.bundle}.journal.csv' if config.bundle else os.path.join(config.output_dir, JOURNAL_FILE_NAME)
+
+
+def count_existing_proofs(config, bundle) -> int:
+    # Proofs left by a previous run, which the journal only keeps track of when resuming
+    if bundle is not None:
+        return count_proofs(bundle)
+
+    return len(list_files(config.output_dir, '.proof'))
+
+
+def open_journal(config) -> dict:
+    # When resuming, the rows completed by previous runs are read first and kept, along with the public key that their
+    # proofs must be signed with, otherwise the journal starts empty
+    path = journal_path_for(config)
+    completed = set()
+    if config.resume and os.path.isfile(path):
+        csv_map(path, lambda i, row: completed.add(tuple(row)))
+        print(f'Resuming after {len(completed)} rows completed in previous runs')
+
+    return {
+        JOURNAL_FILE: open(path, 'a' if config.resume else 'w', newline=''),
+        COMPLETED: completed,
+        PENDING: [],
+        PUBLIC_KEY: load_public_key_from_pem(config.key) if completed else None,
+        OUTPUT_DIR: None if config.bundle else config.output_dir,
+    }
+
+
+def flush_journal(journal: dict, bundle=None):
+    # The bundle is committed, or the proof files renamed into the output dir synced, first, so that the journal never
+    # lists a proof that is not stored yet
+    if bundle is not None:
+        bundle.commit()
+    elif journal[OUTPUT_DIR] is not None and journal[PENDING]:
+        sync_directory(journal[OUTPUT_DIR])
+    csv.writer(journal[JOURNAL_FILE], lineterminator='\n').writerows(journal[PENDING])
+    journal[JOURNAL_FILE].flush()
+    os.fsync(journal[JOURNAL_FILE].fileno())
+    journal[PENDING].clear()
+
+
+def record_completed_row(journal: dict, row: tuple, bundle=None):
+    journal[PENDING].append(row)
+    if len(journal[PENDING]) >= JOURNAL_BATCH_SIZE:
+        flush_journal(journal, bundle)
+
+
+def find_completed_proof(config, journal: dict, bundle, file_name: str, row: tuple, data: dict):
+    """
+    Find the proof that a previous run wrote for a row listed in the journal, so that it does not need to be signed
+    again.
+
+    The proof is only reused if it can still be read, has the same data that it would get now and a valid signature of
+    it by the current key. Otherwise, e.g. if it got lost, corrupted or the assignments changed since, it is None and
+    the proof is written again.
+    """
+    if journal is None or row not in journal[COMPLETED]:
+        return None
+
+    try:
+        if bundle is not None:
+            proof = read_proof(bundle, file_name)
+        else:
+            with open(os.path.join(config.output_dir, file_name)) as proof_file:
+                proof = json.load(proof_file)
+    except (OSError, ValueError):
+        return None
+
+    if proof is None or proof.get("data") != data:
+        return None
+    if not verify_data(data, proof.get("signature"), journal[PUBLIC_KEY]):
+        print(f'\tInvalid signature in the proof of {file_name}')
+        return None
+
+    return proof
+
+
+def preview_unlocks(stats: dict, source: str, vesting: dict, nanowit: int):
+    # Aggregate how many nanowits from this source get unlocked at every timelock
+    unlocks = stats[source].setdefault("unlocks", dict())
+    for timelock, amount in calculate_vesting(vesting, nanowit, GENESIS_TIMESTAMP):
+        unlocks[timelock] = unlocks.get(timelock, 0) + amount
+
+
+def main(config, assignments=None, exclude=()) -> tuple:
+    if config.bundle:
+        # All the proofs go into a single file instead of one file per participant
+        bundle = open_bundle(config.bundle)
+    else:
+        # Create output dir if it doesn't exist
+        mkdirp(config.output_dir)
+        bundle = None
+
+    # Without resuming, the journal starts empty, so proofs of a previous run would end up mixed with the new ones
+    existing_proofs = count_existing_proofs(config, bundle)
+    if existing_proofs and not config.resume:
+        print(f'Error: found {existing_proofs} participant proofs from a previous run in '
+              f'"{config.bundle or config.output_dir}", either resume that run or remove them first')
+        sys.exit(1)
+
+    journal = open_journal(config)
+    stats = init_stats()
+    proofs = []
+
+    line_count = process_all_assignment_files(config, stats, proofs, exclude, bundle, journal)
+
+    # Assignments handed over in memory, e.g. by the pipeline runner
+    if assignments:
+        proofs.extend(process_participants(config, stats, assignments, bundle, journal))
+        line_count += len(assignments)
+
+    unassigned = GENESIS_TOTAL_WITS * NANOWITS_PER_WIT - stats["total"]["wits"]
+    stats["total"]["wits_not_for_foundation"] = stats["total"]["wits"]
+    stats["total"]["wits_unlocked"] = stats["total"]["wits"] - stats["founder"]["wits"] - stats["stakeholder"]["wits"]
+    proofs.append(process_participant(config, stats, "info@witnet.foundation", "Witnet Foundation", 0, unassigned, "foundation", "HvHGJKeOUmOdrZWoaM6LoVJsjNIY4sjq", bundle, journal))
+
+    flush_journal(journal, bundle)
+    journal[JOURNAL_FILE].close()
+
+    if bundle is not None:
+        bundle.commit()
+        bundle.close()
+        print(f'Participant proofs bundled into {config.bundle}')
+
+    for source_stats in stats:
+        stats[source_stats]["percentage_over_total_supply"] = round(
+            float(stats[source_stats]["wits"]) / float(TOTAL_WIT_SUPPLY * NANOWITS_PER_WIT) * 100, 2)
+        stats[source_stats]["percentage_over_genesis"] = round(float(stats[source_stats]["wits"]) / float(
+            stats["total"]["wits"]) * 100, 2)
+        stats[source_stats]["percentage_over_not_for_foundation"] = round(float(stats[source_stats]["wits"]) / float(
+            stats["total"]["wits_not_for_foundation"]) * 100, 2)
+        #stats[source_stats]["percentage_over_unlocked"] = round(float(stats[source_stats]["wits"]) / float(
+        #    stats["total"]["wits_unlocked"]) * 100, 2)
+
+    print(f'\nProcessed {line_count} lines from {config.assignments_dir}')
+    print(f'Stats:\n{json.dumps(stats, indent=4)}')
+
+    return stats, proofs
+
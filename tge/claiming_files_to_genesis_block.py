@@ -0,0 +1,393 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Optional
+
+from ecdsa.util import sigdecode_der
+
+from constants import NANOWITS_PER_WIT, GENESIS_TOTAL_WITS
+from helpers import validate_secp256k1_signature, compute_expected_addresses, find_invalid_addresses, list_files, \
+    load_json_files, parse_json
+from tge.genesis import CHUNKS, LENGTH, ROOT_HASH, compute_consolidation_savings, consolidate_utxos, \
+    serialize_genesis_block, sort_utxos, split_chunks, manifest_path_for, write_genesis_block, write_manifest
+from tge.proof_bundle import is_bundle, open_bundle, read_participations, read_proof, serialize_proof
+
+FIELD_EMAIL_ADDRESS = 'email_address'
+FIELD_NAME = 'name'
+FIELD_SOURCE = 'source'
+FIELD_ADDRESSES = 'addresses'
+FIELD_DISCLAIMERS = 'disclaimers'
+FIELD_SIGNATURE = 'signature'
+FIELD_PUBLIC_KEY = 'public_key'
+
+FIELD_ADDRESS = 'address'
+FIELD_AMOUNT = 'amount'
+FIELD_TIMELOCK = 'timelock'
+FIELD_VALUE = 'value'
+
+EXPECTED_CLAIMS = 'expected_claims'
+GOOD_CLAIMS = 'good_claims'
+BAD_CLAIMS = 'bad_claims'
+MULTIPLE_CLAIMS = 'multiple_claims'
+UNEXPECTED_CLAIMS = 'unexpected claims'
+
+MAPS = 'maps'
+EMAIL_TO_PARTICIPATIONS = 'email_to_participations'
+PARTICIPANT_PROOFS = 'participant_proofs'
+UTXOS_BY_TIMELOCK = 'utxos_by_timelock'
+TOTAL_NANOWITS = 'total_wits'
+CONSOLIDATION = 'consolidation'
+PARTICIPANT_PROOFS_BUNDLE = 'participant_proofs_bundle'
+
+DISCLAIMERS = [
+    '{"title":"Your Initial Instrument is canceled, converted and exchanged into the Tokens","nextText":"Accept and continue","content":["Each and any of the agreements, contracts, instruments or documents, including without limitation Simple Agreements for Future Tokens, Debt Payable by Assets or Prepaid Forward Purchase Agreements (each, an “Initial Instrument”) executed by the Token Holder and the Witnet Foundation (the “Company”) is hereby automatically converted and exchanged into the Tokens and such Initial Instrument(s) are hereby canceled, released, extinguished and of no further force and effect and therefore, all outstanding indebtedness and all other obligations set forth therein are immediately deemed repaid and satisfied in full and irrevocably discharged, terminated and released in their entirety and all assets, property and rights of the Company shall be deemed to be free and clear of any security interests or liens of the Token Holder (the “Conversion”)."]}',
+    '{"title":"The Tokens constitute payment in full of the Initial Instrument and you provide the Company with a full release of claims","nextText":"Accept and continue","content":["The release of the Tokens shall constitute payment in full of the Initial Instrument(s) held by the Token Holder, and following the Conversion, the Company shall have no further liability to the Token Holder with respect to the Initial Instrument(s) held by the Token Holder, and upon the release of the Tokens, the Token Holder hereby releases and discharges the Company and its successors in interest, predecessors in interest, parents, subsidiaries, affiliates, and the officers, directors, stockholders, partners, employees and agents of any and all of them from any and all claims, defaults, debts, charges, damages, demands, obligations, causes, actions or rights of actions related to the Initial Instruments or arising thereunder and whether known or unknown."]}',
+    '{"title":"The Tokens constitute payment in full of the Initial Instrument and you waive any rights you may have thereunder","nextText":"Accept and continue","content":["To the extent necessary or required to effectuate the Conversion, the Company and the Token Holder agree that the foregoing constitutes an amendment to the outstanding Initial Instruments and shall supersede all terms of the Initial Instruments and the Loan Agreements that are inconsistent with the terms hereof and (ii) any notices required in connection with the Conversion pursuant to the Initial Instruments are hereby waived."]}',
+    '{"title":"The Tokens are designed to be used for their intended functionality within the Witnet network. Company will not arrange trading","nextText":"Accept and continue","content":["The Tokens are designed to be used for their intended functionality as compensation for nodes that retrieve, aggregate and deliver data upon request from third party software developers. The consumptive orientation of the Tokens diminishes the possibility that the Tokens could appreciate in value or that Token holders might be inclined to trade the Tokens on secondary marketplaces. The Company will not arrange for the trading of the Tokens on secondary markets or platforms. The Company will not engage in buybacks with respect to the Tokens."]}',
+    '{"title":"You are solely responsible for the results obtained by the use of the Tokens","nextText":"Accept and continue","content":["Token Holder assumes all risk and liability for the results obtained by the use of the Tokens and regardless of any oral or written statements made by the Company, by way of technical advice or otherwise, related to the use of the Tokens."]}',
+]
+
+SOURCE_DPA = 'dpa'
+SOURCE_FOUNDATION = 'foundation'
+SOURCE_FOUNDER = 'founder'
+SOURCE_PPA = 'ppa'
+SOURCE_SAFT = 'saft'
+SOURCE_STAKEHOLDER = 'stakeholder'
+SOURCE_TIP = 'tip'
+
+
+class ClaimingFile:
+    def __init__(self, email_address, name, source, addresses, disclaimers, signature):
+        print(f'Loading ClaimingFile for {email_address} (source is {source})')
+        # Name, email, and signature are validated in validate_claiming_file
+        self.signature = signature
+        self.email_address = email_address
+        self.name = name
+        self.source = source
+        # Address value and timelock is validated in validate_claiming_file
+        # The address is validated when the node tries to create the genesis block
+        self.addresses = [{
+            FIELD_ADDRESS: x["address"],
+            FIELD_AMOUNT: str(x["amount"]),
+            FIELD_TIMELOCK: str(x["timelock"]),
+        } for x in addresses]
+        # Disclaimers are validated here
+        self.disclaimers = [
+            validate_signature(disclaimer, disclaimers[f'{i}'])
+            for i, disclaimer in enumerate(get_disclaimers_for_source(source))]
+
+    @staticmethod
+    def from_json_object(json_object: dict) -> 'ClaimingFile':
+        return ClaimingFile(
+            json_object[FIELD_EMAIL_ADDRESS],
+            json_object[FIELD_NAME],
+            json_object[FIELD_SOURCE],
+            json_object[FIELD_ADDRESSES],
+            json_object[FIELD_DISCLAIMERS],
+            json_object[FIELD_SIGNATURE])
+
+
+def get_disclaimers_for_source(source: str) -> list:
+    return {
+        SOURCE_DPA: DISCLAIMERS,
+        SOURCE_FOUNDATION: DISCLAIMERS,
+        SOURCE_FOUNDER: DISCLAIMERS[3:],
+        SOURCE_PPA: DISCLAIMERS,
+        SOURCE_SAFT: DISCLAIMERS,
+        SOURCE_STAKEHOLDER: DISCLAIMERS[3:],
+        SOURCE_TIP: DISCLAIMERS[3:],
+    }.get(source, DISCLAIMERS)
+
+
+def init_state():
+    return {
+        MAPS: {
+            EMAIL_TO_PARTICIPATIONS: dict(),
+            PARTICIPANT_PROOFS: dict(),
+        },
+        UTXOS_BY_TIMELOCK: dict(),
+        EXPECTED_CLAIMS: set(),
+        GOOD_CLAIMS: set(),
+        BAD_CLAIMS: set(),
+        MULTIPLE_CLAIMS: set(),
+        UNEXPECTED_CLAIMS: set(),
+        TOTAL_NANOWITS: 0,
+        CONSOLIDATION: None,
+        PARTICIPANT_PROOFS_BUNDLE: None,
+    }
+
+
+def process_all_claim_files(config, stats: dict):
+    validator = VALIDATORS[config.validator]
+    # Visit all claim files
+    for json_path, claiming_file_json_object in load_json_files(list_files(config.claim_files_dir, '.json')):
+        if isinstance(claiming_file_json_object, Exception):
+            print(f'Failed to load claim file "{json_path}": {claiming_file_json_object}')
+            continue
+        process_claim_file(stats, json_path, validator, claiming_file_json_object)
+
+
+def process_all_participant_proof_files(config, stats: dict):
+    # Visit all participant proof files
+    for json_path, participant_proof_json_object in load_json_files(list_files(config.participant_proofs_dir,
+                                                                               '.proof')):
+        if isinstance(participant_proof_json_object, Exception):
+            raise participant_proof_json_object
+        register_participant_proof(stats, json_path, participant_proof_json_object)
+
+
+def process_participant_proofs_bundle(config, stats: dict):
+    # Only the index is loaded here, every proof is read from the bundle once its claim shows up
+    bundle = open_bundle(config.participant_proofs_dir)
+    for file_name, email_address, _source in read_participations(bundle):
+        register_participation(stats, file_name, email_address)
+    stats[PARTICIPANT_PROOFS_BUNDLE] = bundle
+
+
+def process_claim_file(state: dict, claim_file_path: str, validator=None, claiming_file_json_object: dict = None):
+    validator = validator or validate_claiming_file
+    email_to_participations = state[MAPS][EMAIL_TO_PARTICIPATIONS]
+
+    if claiming_file_json_object is None:
+        with open(claim_file_path, 'rb') as json_file:
+            claiming_file_json_object = parse_json(json_file.read())
+
+    claim = ClaimingFile.from_json_object(claiming_file_json_object)
+
+    # If we were not expecting this participant, mark as "unexpected"
+    if claim.email_address not in state[EXPECTED_CLAIMS]:
+        state[UNEXPECTED_CLAIMS].add(claim.email_address)
+        return
+
+    # If we have already processed a claim for this participant, either good or bad, mark as "multiple"
+    if claim.email_address in state[GOOD_CLAIMS] or claim.email_address in state[BAD_CLAIMS]:
+        state[MULTIPLE_CLAIMS].add(claim.email_address)
+        return
+
+    participant_proof_file_path = email_to_participations.get(claim.email_address).pop(claim.source)
+    participant_proof = state[MAPS][PARTICIPANT_PROOFS].get(participant_proof_file_path)
+    if participant_proof is None and state[PARTICIPANT_PROOFS_BUNDLE] is not None:
+        participant_proof = read_proof(state[PARTICIPANT_PROOFS_BUNDLE], participant_proof_file_path)
+    validated_claim = validator(participant_proof_file_path, claim_file_path, participant_proof,
+                                claiming_file_json_object)
+
+    print(f'Validity: {validated_claim is not None}')
+
+    if validated_claim:
+        state[GOOD_CLAIMS].add(claim.email_address)
+        state[BAD_CLAIMS].discard(claim.email_address)
+        # The addresses are taken from the validated claim, which may contain amended timelocks
+        for claim_address in validated_claim[FIELD_ADDRESSES]:
+            address = {
+                FIELD_ADDRESS: claim_address[FIELD_ADDRESS],
+                FIELD_VALUE: claim_address[FIELD_AMOUNT],
+                FIELD_TIMELOCK: claim_address[FIELD_TIMELOCK],
+            }
+            state[UTXOS_BY_TIMELOCK].setdefault(address[FIELD_TIMELOCK], list()).append(address)
+            state[TOTAL_NANOWITS] += address[FIELD_VALUE]
+    else:
+        state[BAD_CLAIMS].add(claim.email_address)
+
+    # Cleanup participations dictionary if all sources for the address have been claimed
+    if not email_to_participations.get(claim.email_address):
+        email_to_participations.pop(claim.email_address)
+
+
+def process_participant_proof_file(stats: dict, participant_proof_file_path: str):
+    with open(participant_proof_file_path) as json_file:
+        participant_proof_json_object = json.load(json_file)
+        register_participant_proof(stats, participant_proof_file_path, participant_proof_json_object)
+
+
+def register_participant_proof(stats: dict, participant_proof_file_path: str, participant_proof_json_object: dict):
+    participant_email = participant_proof_json_object["data"][FIELD_EMAIL_ADDRESS]
+
+    register_participation(stats, participant_proof_file_path, participant_email)
+    stats[MAPS][PARTICIPANT_PROOFS][participant_proof_file_path] = participant_proof_json_object
+
+
+def register_participation(stats: dict, participant_proof_file_path: str, participant_email: str):
+    email_to_participations = stats[MAPS][EMAIL_TO_PARTICIPATIONS]
+    source = os.path.split(participant_proof_file_path)[-1].split('_')[0]
+
+    email_to_participations.setdefault(participant_email, dict()).setdefault(source, participant_proof_file_path)
+    stats[EXPECTED_CLAIMS].add(participant_email)
+
+
+def validate_claiming_file(participation_proof_file_path: str, token_claim_file_path: str,
+                           participant_proof: dict = None, _token_claim: dict = None) -> Optional[dict]:
+    if participant_proof is not None and not os.path.isfile(participation_proof_file_path):
+        # The proof only exists in a bundle, so it is handed over to the script through a temporary file
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            temporary_file_path = os.path.join(temporary_dir, os.path.basename(participation_proof_file_path))
+            with open(temporary_file_path, 'w') as proof_file:
+                proof_file.write(serialize_proof(participant_proof))
+            return validate_claiming_file(temporary_file_path, token_claim_file_path)
+
+    # The script reads the participant proof and the claim from disk by itself
+    cmd = ["node", "validate_claiming_file_script.js", participation_proof_file_path, token_claim_file_path]
+    print(f'Running CMD: {" ".join(cmd)}')
+    try:
+        stdout = subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+
+        return json.loads(stdout)
+    except subprocess.CalledProcessError:
+        print(f'Validate claiming file failed')
+
+
+def validate_claiming_file_locally(participation_proof_file_path: str, token_claim_file_path: str,
+                                   participant_proof: dict = None, token_claim: dict = None) -> Optional[dict]:
+    # Same checks as validate_claiming_file_script.js, but using the vesting schedule engine instead of spawning node
+    print(f'Validating "{token_claim_file_path}" with "{participation_proof_file_path}"')
+    try:
+        if participant_proof is None:
+            with open(participation_proof_file_path) as json_file:
+                participant_proof = json.load(json_file)
+        if token_claim is None:
+            with open(token_claim_file_path) as json_file:
+                token_claim = json.load(json_file)
+
+        data = participant_proof["data"]
+        expected_addresses = compute_expected_addresses(data["vesting"], data["wit"], data["genesis_date"])
+        expected_fields = {
+            FIELD_EMAIL_ADDRESS: data.get(FIELD_EMAIL_ADDRESS),
+            FIELD_NAME: data.get(FIELD_NAME),
+            FIELD_SOURCE: data.get(FIELD_SOURCE),
+            FIELD_SIGNATURE: participant_proof.get(FIELD_SIGNATURE),
+        }
+        # Disclaimers are validated in ClaimingFile
+        actual_fields = {key: value for key, value in token_claim.items()
+                         if key not in (FIELD_ADDRESSES, FIELD_DISCLAIMERS)}
+        actual_addresses = [(address.get(FIELD_AMOUNT), address.get(FIELD_TIMELOCK))
+                            for address in token_claim[FIELD_ADDRESSES]]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+        print(f'Validate claiming file failed: {error}')
+        return
+
+    if actual_fields != expected_fields:
+        print(f'Validate claiming file failed: claim does not match the participant proof')
+        return
+
+    # Every expected address must be there with its exact amount, but timelocks are allowed to be up to 1h earlier than
+    # expected (never later)
+    if actual_addresses != expected_addresses and (
+            len(actual_addresses) != len(expected_addresses)
+            or not all(actual_amount == expected_amount
+                       and isinstance(actual_timelock, (int, float))
+                       and 0 <= expected_timelock - actual_timelock <= 3600
+                       for (actual_amount, actual_timelock), (expected_amount, expected_timelock)
+                       in zip(actual_addresses, expected_addresses))):
+        print(f'Validate claiming file failed: addresses do not match the vesting schedule')
+        return
+
+    # Return the final validated claim, with the timelocks replaced with the ones that we are expecting
+    return {**token_claim, FIELD_ADDRESSES: [{**address, FIELD_TIMELOCK: expected_timelock}
+                                             for address, (_, expected_timelock)
+                                             in zip(token_claim[FIELD_ADDRESSES], expected_addresses)]}
+
+
+def validate_signature(message: str, signature_object: dict) -> Optional[dict]:
+    signature = signature_object[FIELD_SIGNATURE]
+    public_key = signature_object[FIELD_PUBLIC_KEY]
+    print(f'Validating signature:\n\tSignature: {signature}\n\tPK: {public_key}\n\tMessage: \'{message}\'')
+
+    valid = validate_secp256k1_signature(signature, message, public_key, sigdecode=sigdecode_der)
+
+    if valid:
+        print(f'\tValid!')
+        return signature_object
+
+
+def consolidate_genesis_utxos(config, state: dict):
+    # Merge the UTXOs with the same address and timelock. The bytes that this saves are worked out from the merged UTXOs
+    # alone, and only turned into sizes by report_consolidation once the genesis block is serialized
+    utxos_by_timelock = state[UTXOS_BY_TIMELOCK]
+    state[UTXOS_BY_TIMELOCK] = consolidate_utxos(utxos_by_timelock)
+    state[CONSOLIDATION] = {
+        'before': {'utxos': sum(len(chunk) for chunk in utxos_by_timelock.values())},
+        'after': {'utxos': sum(len(chunk) for chunk in state[UTXOS_BY_TIMELOCK].values())},
+        'saved_bytes': compute_consolidation_savings(utxos_by_timelock, state[UTXOS_BY_TIMELOCK],
+                                                     int(config.max_chunk_entries)),
+    }
+
+
+def report_consolidation(state: dict, manifest: dict):
+    # The size of the serialized chunks after consolidating them is already in the manifest
+    consolidation = state[CONSOLIDATION]
+    consolidation['after']['bytes'] = sum(chunk[LENGTH] for chunk in manifest[CHUNKS])
+    consolidation['before']['bytes'] = consolidation['after']['bytes'] + consolidation.pop('saved_bytes')
+
+    print(f'Consolidated {consolidation["before"]["utxos"]} UTXOs into {consolidation["after"]["utxos"]}, and the '
+          f'serialized chunks from {consolidation["before"]["bytes"]} bytes into {consolidation["after"]["bytes"]}')
+
+
+VALIDATORS = {
+    'node': validate_claiming_file,
+    'python': validate_claiming_file_locally,
+}
+
+
+def main(config, participant_proofs=None) -> dict:
+    state = init_state()
+
+    if participant_proofs is None and is_bundle(config.participant_proofs_dir):
+        process_participant_proofs_bundle(config, state)
+    elif participant_proofs is None:
+        process_all_participant_proof_files(config, state)
+    else:
+        # Participant proofs handed over in memory, e.g. by the pipeline runner
+        for participant_proof_file_path, participant_proof in participant_proofs:
+            register_participant_proof(state, participant_proof_file_path, participant_proof)
+    print(f'Loaded {len(state[MAPS][EMAIL_TO_PARTICIPATIONS])} participations')
+    process_all_claim_files(config, state)
+    if state[PARTICIPANT_PROOFS_BUNDLE] is not None:
+        state[PARTICIPANT_PROOFS_BUNDLE].close()
+
+    if len(state[MAPS][EMAIL_TO_PARTICIPATIONS]) > 0:
+        print(f"Warning: the following users have not submitted their claim file:\n"
+              f"{list(state[MAPS][EMAIL_TO_PARTICIPATIONS].keys())}")
+
+    # Make sure that the node will be able to decode every address before writing anything
+    invalid_addresses = find_invalid_addresses(
+        utxo[FIELD_ADDRESS] for chunk in state[UTXOS_BY_TIMELOCK].values() for utxo in chunk)
+    if invalid_addresses:
+        print(f'Error: found {len(invalid_addresses)} invalid addresses, refusing to write the genesis block:\n'
+              f'{sorted(invalid_addresses, key=repr)}')
+        sys.exit(1)
+
+    if config.consolidate_utxos:
+        consolidate_genesis_utxos(config, state)
+
+    state[UTXOS_BY_TIMELOCK] = sort_utxos(state[UTXOS_BY_TIMELOCK])
+
+    # One chunk per timelock, unless it has too many UTXOs, serialized in parallel
+    genesis_block_json, manifest = serialize_genesis_block(
+        split_chunks(state[UTXOS_BY_TIMELOCK], int(config.max_chunk_entries)), int(config.genesis_workers))
+    if config.consolidate_utxos:
+        report_consolidation(state, manifest)
+    if config.write_genesis_block is None:
+        print("GENESIS BLOCK:")
+        print(genesis_block_json)
+    else:
+        write_genesis_block(config.write_genesis_block, genesis_block_json, manifest)
+        print(f"Genesis block written to {config.write_genesis_block}")
+
+        manifest_path = config.write_manifest or manifest_path_for(config.write_genesis_block)
+        write_manifest(manifest, manifest_path)
+        print(f"Manifest of {len(manifest[CHUNKS])} chunks written to {manifest_path} "
+              f"(root hash {manifest[ROOT_HASH]})")
+
+    unclaimed_nanowits = (GENESIS_TOTAL_WITS * 2 / 3 * NANOWITS_PER_WIT) - state[TOTAL_NANOWITS]
+    foundation_nanowits = (GENESIS_TOTAL_WITS * NANOWITS_PER_WIT) - state[TOTAL_NANOWITS]
+
+    print(f'Good claims ({len(state[GOOD_CLAIMS])}): {list(state[GOOD_CLAIMS])}')
+    print(f'Bad claims ({len(state[BAD_CLAIMS])}): {list(state[BAD_CLAIMS])}')
+    print(f'Multiple claims ({len(state[MULTIPLE_CLAIMS])}): {list(state[MULTIPLE_CLAIMS])}')
+    print(f'Unexpected claims ({len(state[UNEXPECTED_CLAIMS])}): {list(state[UNEXPECTED_CLAIMS])}')
+    print(f'Total assigned value: {state[TOTAL_NANOWITS]} nWit / {state[TOTAL_NANOWITS] / NANOWITS_PER_WIT} wit')
+    print(f'Left to claim: {unclaimed_nanowits} nWit / {unclaimed_nanowits / NANOWITS_PER_WIT} wit')
+    print(f'Value claimable by foundation: {foundation_nanowits} nWit / {foundation_nanowits / NANOWITS_PER_WIT} wit')
+
+    return state
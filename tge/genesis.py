@@ -0,0 +1,322 @@
+"""
+Serialization of the genesis block, in chunks of UTXOs by timelock, along with a manifest for checking its integrity.
+
+Before serializing, the UTXOs with the same address and timelock can be merged, and timelocks with too many UTXOs can
+be split into several chunks. UTXOs are always laid out in the same canonical order, so that rebuilding out of the
+same claims gives the same genesis block.
+
+The chunks are serialized in parallel and joined in order, into exactly the same text as serializing the whole genesis
+block at once with `json.dumps(indent=4)`. The manifest lists, for every chunk, its timelock, how many UTXOs it has,
+their total value, where it lies in the genesis block file and the SHA-256 of its text, plus a root hash over all of
+them and the length and SHA-256 of the whole file. Comparing the manifests of two builds tells which chunks changed
+without reading the genesis block files.
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import WIT_PRECISION
+
+GENESIS_BLOCK_HEAD = '{\n    "alloc": ['
+GENESIS_BLOCK_TAIL = '\n    ]\n}'
+CHUNK_SEPARATOR = ',\n'
+CHUNK_INDENT = ' ' * 8
+# UTXOs are nested one level deeper than their chunk, and separated like chunks are
+UTXO_INDENT = CHUNK_INDENT + ' ' * 4
+UTXO_SEPARATOR = ',\n'
+# Files end with a newline after the JSON text
+FILE_END = '\n'
+
+FIELD_ADDRESS = 'address'
+FIELD_VALUE = 'value'
+
+CHUNKS = 'chunks'
+TIMELOCK = 'timelock'
+PART = 'part'
+UTXOS = 'utxos'
+VALUE = 'value'
+OFFSET = 'offset'
+LENGTH = 'length'
+SHA256 = 'sha256'
+ROOT_HASH = 'root_hash'
+FILE_LENGTH = 'file_length'
+FILE_SHA256 = 'file_sha256'
+LAYOUT = 'layout'
+
+
+def consolidate_chunk(chunk: list) -> list:
+    # Merge the UTXOs that pay to the same address. Only values that are multiples of WIT_PRECISION are merged, so that
+    # merged values are still rounded to it, and any other value is kept apart as is
+    consolidated = []
+    utxo_by_address = dict()
+    for utxo in chunk:
+        if utxo[FIELD_VALUE] % WIT_PRECISION != 0:
+            consolidated.append(utxo)
+            continue
+
+        merged = utxo_by_address.get(utxo[FIELD_ADDRESS])
+        if merged is None:
+            utxo_by_address[utxo[FIELD_ADDRESS]] = merged = dict(utxo)
+            consolidated.append(merged)
+        else:
+            merged[FIELD_VALUE] += utxo[FIELD_VALUE]
+
+    return consolidated
+
+
+def consolidate_utxos(chunks_by_timelock: dict) -> dict:
+    # Chunks are already grouped by timelock, so this merges the UTXOs with the same address and timelock
+    return {timelock: consolidate_chunk(chunk) for timelock, chunk in chunks_by_timelock.items()}
+
+
+def sort_utxos(chunks_by_timelock: dict) -> dict:
+    # Canonical order, by timelock and then by address and value, so that building the genesis block out of the same
+    # claims always gives the same chunks, hashes and manifest. Addresses are hashes, so this order does not tell in
+    # which order the claims came in either
+    return {timelock: sorted(chunk, key=lambda utxo: (utxo[FIELD_ADDRESS], utxo[FIELD_VALUE]))
+            for timelock, chunk in sorted(chunks_by_timelock.items())}
+
+
+def split_chunks(chunks_by_timelock: dict, max_entries: int = 0) -> list:
+    # Timelocks with more UTXOs than the maximum are spread over several consecutive chunks, returned as (timelock,
+    # chunk) pairs
+    if max_entries <= 0:
+        return list(chunks_by_timelock.items())
+
+    return [(timelock, chunk[i:i + max_entries])
+            for timelock, chunk in chunks_by_timelock.items() for i in range(0, len(chunk), max_entries)]
+
+
+def serialize_chunk(chunk: list) -> str:
+    # Same as the chunk would look like inside the serialized genesis block, which nests it two levels deep
+    return CHUNK_INDENT + json.dumps(chunk, indent=4).replace('\n', '\n' + CHUNK_INDENT)
+
+
+def serialize_chunks(chunks: list, workers: int = 1) -> list:
+    if workers <= 1 or len(chunks) <= 1:
+        return [serialize_chunk(chunk) for chunk in chunks]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(serialize_chunk, chunks))
+
+
+def utxo_length(utxo: dict) -> int:
+    # Bytes taken by a UTXO inside a serialized chunk, counting its indentation and the separator after it
+    return len((UTXO_INDENT + json.dumps(utxo, indent=4).replace('\n', '\n' + UTXO_INDENT)).encode('utf8')) + \
+        len(UTXO_SEPARATOR)
+
+
+# Any chunk with UTXOs takes as many bytes as its UTXOs, as measured by utxo_length, plus this many
+CHUNK_OVERHEAD = len(serialize_chunk([{}]).encode('utf8')) - utxo_length({})
+
+
+def count_parts(chunk: list, max_entries: int = 0) -> int:
+    # How many chunks split_chunks makes out of the chunk
+    return 1 if max_entries <= 0 else len(range(0, len(chunk), max_entries))
+
+
+def compute_consolidation_savings(chunks_by_timelock: dict, consolidated_by_timelock: dict,
+                                  max_entries: int = 0) -> int:
+    """
+    How many bytes fewer the serialized chunks take after consolidating them, without serializing them.
+
+    Only the UTXOs that were merged and the UTXOs they were merged into are measured, plus the chunks that are no
+    longer needed when timelocks are split into several chunks.
+    """
+    saved = 0
+    for timelock, chunk in chunks_by_timelock.items():
+        consolidated = consolidated_by_timelock[timelock]
+        saved += (count_parts(chunk, max_entries) - count_parts(consolidated, max_entries)) * CHUNK_OVERHEAD
+
+        counts = collections.Counter(utxo[FIELD_ADDRESS] for utxo in chunk if utxo[FIELD_VALUE] % WIT_PRECISION == 0)
+        merged_addresses = {address for address, count in counts.items() if count > 1}
+        if not merged_addresses:
+            continue
+
+        saved += sum(utxo_length(utxo) for utxo in chunk
+                     if utxo[FIELD_ADDRESS] in merged_addresses and utxo[FIELD_VALUE] % WIT_PRECISION == 0)
+        saved -= sum(utxo_length(utxo) for utxo in consolidated
+                     if utxo[FIELD_ADDRESS] in merged_addresses and utxo[FIELD_VALUE] % WIT_PRECISION == 0)
+
+    return saved
+
+
+def compute_root_hash(chunk_hashes: list) -> str:
+    return hashlib.sha256(b''.join(bytes.fromhex(chunk_hash) for chunk_hash in chunk_hashes)).hexdigest()
+
+
+def serialize_genesis_block(chunks: list, workers: int = 1) -> tuple:
+    """
+    Serialize the genesis block out of (timelock, chunk) pairs, in the order of the list, and build its manifest.
+
+    Returns the text of the genesis block and the manifest.
+    """
+    timelocks = [timelock for timelock, _ in chunks]
+    chunks = [chunk for _, chunk in chunks]
+    serialized_chunks = serialize_chunks(chunks, workers)
+    if not serialized_chunks:
+        return json.dumps({'alloc': []}, indent=4), build_manifest([], [], [], [])
+
+    offsets = []
+    offset = len((GENESIS_BLOCK_HEAD + '\n').encode('utf8'))
+    for serialized_chunk in serialized_chunks:
+        offsets.append(offset)
+        offset += len(serialized_chunk.encode('utf8')) + len(CHUNK_SEPARATOR)
+
+    genesis_block_json = GENESIS_BLOCK_HEAD + '\n' + CHUNK_SEPARATOR.join(serialized_chunks) + GENESIS_BLOCK_TAIL
+    manifest = build_manifest(timelocks, chunks, serialized_chunks, offsets)
+
+    return genesis_block_json, manifest
+
+
+def build_manifest(timelocks: list, chunks: list, serialized_chunks: list, offsets: list) -> dict:
+    # Tell apart the chunks of a timelock that was split
+    parts = []
+    parts_by_timelock = dict()
+    for timelock in timelocks:
+        parts.append(parts_by_timelock.get(timelock, 0))
+        parts_by_timelock[timelock] = parts[-1] + 1
+
+    manifest_chunks = [{
+        TIMELOCK: timelock,
+        PART: part,
+        UTXOS: len(chunk),
+        VALUE: sum(utxo[FIELD_VALUE] for utxo in chunk),
+        OFFSET: offset,
+        LENGTH: len(serialized_chunk.encode('utf8')),
+        SHA256: hashlib.sha256(serialized_chunk.encode('utf8')).hexdigest(),
+    } for timelock, part, chunk, serialized_chunk, offset
+        in zip(timelocks, parts, chunks, serialized_chunks, offsets)]
+
+    return {
+        UTXOS: sum(chunk[UTXOS] for chunk in manifest_chunks),
+        VALUE: sum(chunk[VALUE] for chunk in manifest_chunks),
+        ROOT_HASH: compute_root_hash([chunk[SHA256] for chunk in manifest_chunks]),
+        CHUNKS: manifest_chunks,
+    }
+
+
+def write_genesis_block(path: str, genesis_block_json: str, manifest: dict):
+    # The manifest also covers the whole file, exactly as written
+    contents = (genesis_block_json + FILE_END).encode('utf8')
+    with open(path, 'wb') as genesis_block_file:
+        genesis_block_file.write(contents)
+
+    manifest[FILE_LENGTH] = len(contents)
+    manifest[FILE_SHA256] = hashlib.sha256(contents).hexdigest()
+
+
+def manifest_path_for(genesis_block_path: str) -> str:
+    return f'{os.path.splitext(genesis_block_path)[0]}.manifest.json'
+
+
+def write_manifest(manifest: dict, path: str):
+    with open(path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+        manifest_file.write('\n')
+
+
+def read_manifest(path: str) -> dict:
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def layout_matches(contents: bytes, chunks: list) -> bool:
+    # Whatever lies around the chunks must be exactly the head, the separators and the tail of the genesis block, so
+    # that nothing can be added to the file without being covered by a chunk
+    if not chunks:
+        return contents == (json.dumps({'alloc': []}, indent=4) + FILE_END).encode('utf8')
+
+    position = 0
+    separators = [GENESIS_BLOCK_HEAD + '\n'] + [CHUNK_SEPARATOR] * (len(chunks) - 1)
+    for separator, chunk in zip(separators, chunks):
+        separator = separator.encode('utf8')
+        if contents[position:position + len(separator)] != separator or chunk[OFFSET] != position + len(separator):
+            return False
+        position = chunk[OFFSET] + chunk[LENGTH]
+
+    return contents[position:] == (GENESIS_BLOCK_TAIL + FILE_END).encode('utf8')
+
+
+def verify_genesis_block(genesis_block_path: str, manifest: dict) -> list:
+    """
+    Check a genesis block file against its manifest: its length and hash as a whole, the hash of every chunk, and that
+    the chunks cover the whole file but for the head, the separators and the tail.
+
+    Returns what mismatches: the timelocks of the chunks, or the names of the checks on the whole file.
+    """
+    with open(genesis_block_path, 'rb') as genesis_block_file:
+        contents = genesis_block_file.read()
+
+    mismatches = []
+    if len(contents) != manifest.get(FILE_LENGTH):
+        mismatches.append(FILE_LENGTH)
+    if hashlib.sha256(contents).hexdigest() != manifest.get(FILE_SHA256):
+        mismatches.append(FILE_SHA256)
+
+    for chunk in manifest[CHUNKS]:
+        if hashlib.sha256(contents[chunk[OFFSET]:chunk[OFFSET] + chunk[LENGTH]]).hexdigest() != chunk[SHA256]:
+            mismatches.append(chunk[TIMELOCK])
+
+    if not layout_matches(contents, manifest[CHUNKS]):
+        mismatches.append(LAYOUT)
+
+    if compute_root_hash([chunk[SHA256] for chunk in manifest[CHUNKS]]) != manifest[ROOT_HASH]:
+        mismatches.append(ROOT_HASH)
+
+    return mismatches
+
+
+def diff_manifests(old: dict, new: dict) -> dict:
+    # Compare two builds chunk by chunk, by timelock and part
+    old_chunks = {(chunk[TIMELOCK], chunk[PART]): chunk for chunk in old[CHUNKS]}
+    new_chunks = {(chunk[TIMELOCK], chunk[PART]): chunk for chunk in new[CHUNKS]}
+
+    return {
+        'same_root_hash': old[ROOT_HASH] == new[ROOT_HASH],
+        'added': [{TIMELOCK: timelock, PART: part} for timelock, part in new_chunks
+                  if (timelock, part) not in old_chunks],
+        'removed': [{TIMELOCK: timelock, PART: part} for timelock, part in old_chunks
+                    if (timelock, part) not in new_chunks],
+        'changed': [{
+            TIMELOCK: key[0],
+            PART: key[1],
+            UTXOS: [old_chunks[key][UTXOS], new_chunks[key][UTXOS]],
+            VALUE: [old_chunks[key][VALUE], new_chunks[key][VALUE]],
+        } for key in new_chunks if key in old_chunks and old_chunks[key][SHA256] != new_chunks[key][SHA256]],
+    }
+
+
+def main(config):
+    if config.command == 'verify':
+        manifest = read_manifest(config.manifest or manifest_path_for(config.genesis_block))
+        mismatches = verify_genesis_block(config.genesis_block, manifest)
+        if mismatches:
+            print(f'Genesis block "{config.genesis_block}" does not match its manifest in: {mismatches}')
+            raise SystemExit(1)
+        print(f'Genesis block "{config.genesis_block}" matches its manifest ({len(manifest[CHUNKS])} chunks, '
+              f'root hash {manifest[ROOT_HASH]})')
+    else:
+        print(json.dumps(diff_manifests(read_manifest(config.old_manifest), read_manifest(config.new_manifest)),
+                         indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='check a genesis block against its manifest, or tell which chunks changed between two builds')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    verify_parser = subparsers.add_parser('verify', help='check every chunk of a genesis block against its manifest')
+    verify_parser.add_argument('genesis_block',
+                               help='genesis block JSON file')
+    verify_parser.add_argument('--manifest', default=None,
+                               help='manifest of the genesis block (default: the one next to the genesis block)')
+    diff_parser = subparsers.add_parser('diff', help='list the chunks that differ between two manifests')
+    diff_parser.add_argument('old_manifest',
+                             help='manifest of the previous build')
+    diff_parser.add_argument('new_manifest',
+                             help='manifest of the new build')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,708 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import TOTAL_TOKENS_IN_TIP, NANOWITS_PER_WIT
+from helpers import mkdirp, csv_map, download_file, SetEncoder, decompress_all_in_path, validate_secp256k1_signature, \
+    derive_address_from_public_key, generate_random_string, list_files, read_file, read_files, \
+    parse_json, write_table
+from tge.participants import PARTICIPANT_BY_WIT_ID, WIT_ID_FIELD, EMAIL_FIELD, EMAILS_FIELD, NAME_FIELD, load_index, \
+    save_index, add_address, set_email, find_by_wit_id, normalize_email, normalize_wit_id
+
+PARTICIPANTS = 'participants'
+MAPS = 'maps'
+BLOCKS = 'blocks'
+REWARDS = 'rewards'
+
+FROM_CSV = 'node_claims_from_csv'
+DOWNLOADED = 'downloaded_node_claim_files'
+DECOMPRESSED = 'decompressed_node_claim_files'
+PARSED = 'parsed_node_claim_files'
+SCHEMA = 'valid_schema_node_claim_files'
+SIGNATURE = 'valid_signature_in_node_claim_file'
+ADDRESS = 'valid_address_in_node_claim_file'
+KYC = 'passed_kyc'
+
+# Steps that a node claim goes through, in order
+CLAIM_STAGES = [FROM_CSV, DOWNLOADED, DECOMPRESSED, PARSED, SCHEMA, SIGNATURE, ADDRESS]
+
+WIT_IDS = 'wit_ids'
+WIT_IDS_COUNT = 'wit_ids_count'
+EMAILS = 'emails'
+ADDRESSES = 'addresses'
+ADDRESSES_COUNT = 'addresses_count'
+MISSING_WIT_IDS = 'missing_wit_ids'
+MISSING_EMAILS = 'missing_emails'
+MISSING_ADDRESSES = 'missing_addresses'
+
+ADDRESSES_BY_WIT_ID = 'addresses_by_wit_id'
+WIT_ID_BY_ADDRESS = 'wit_id_by_address'
+EMAIL_BY_WIT_ID = 'email_by_wit_id'
+NAME_BY_WIT_ID = 'name_by_wit_id'
+CLAIM_FILES_BY_DIGEST = 'claim_files_by_digest'
+CLAIM_DIGESTS_BY_WIT_ID = 'claim_digests_by_wit_id'
+
+TOTAL_COUNT = 'total_count'
+TOTAL_IN_PROGRAM = 'total_in_program'
+TOTAL_OUTSIDE_PROGRAM = 'total_outside_program'
+ROWS_OUTSIDE_PROGRAM = 'rows_outside_program'
+BY_ADDRESS = 'by_address'
+BY_WIT_ID = 'by_wit_id'
+
+TOTAL = 'total'
+TOTAL_DIRECT = 'total_direct'
+TOTAL_FROM_BLOCKS = 'total_from_blocks'
+
+ADDRESS_FIELD = 'address'
+IDENTIFIER_FIELD = 'identifier'
+PUBLIC_KEY_FIELD = 'public_key'
+SIGNATURE_FIELD = 'signature'
+
+UNKNOWN = 'unknown'
+
+# Compiled once, as they are checked for every claim file
+CLAIM_FILE_NAME_REGEX = re.compile('(WIT_.....).*')
+CLAIM_ADDRESS_REGEX = re.compile('^twit1.+')
+CLAIM_IDENTIFIER_REGEX = re.compile(r'^WIT_\w\w\w\w\w$')
+
+# Where claim archives are downloaded to and decompressed when fetching them, one subdirectory per participant
+DOWNLOADS_DIR = 'downloads'
+# How many participants can be waiting at most between two steps of fetch_all_participants
+FETCH_QUEUE_SIZE = 64
+
+
+def init_stats() -> dict:
+    return {
+        PARTICIPANTS: {
+            FROM_CSV: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                EMAILS: set(),
+            },
+            DOWNLOADED: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                EMAILS: set(),
+                MISSING_WIT_IDS: set(),
+                MISSING_EMAILS: set(),
+            },
+            DECOMPRESSED: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                MISSING_WIT_IDS: set(),
+            },
+            PARSED: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                MISSING_WIT_IDS: set(),
+            },
+            SCHEMA: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                ADDRESSES_COUNT: 0,
+                ADDRESSES: set(),
+                MISSING_WIT_IDS: set(),
+            },
+            SIGNATURE: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                ADDRESSES_COUNT: 0,
+                ADDRESSES: set(),
+                MISSING_WIT_IDS: set(),
+                MISSING_ADDRESSES: set(),
+            },
+            ADDRESS: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                ADDRESSES_COUNT: 0,
+                ADDRESSES: set(),
+                MISSING_WIT_IDS: set(),
+                MISSING_ADDRESSES: set(),
+            },
+            KYC: {
+                WIT_IDS_COUNT: 0,
+                WIT_IDS: set(),
+                EMAILS: set(),
+                MISSING_WIT_IDS: set(),
+                MISSING_EMAILS: set(),
+            }
+        },
+        MAPS: {
+            ADDRESSES_BY_WIT_ID: dict(),
+            WIT_ID_BY_ADDRESS: dict(),
+            EMAIL_BY_WIT_ID: dict(),
+            NAME_BY_WIT_ID: dict(),
+            CLAIM_FILES_BY_DIGEST: dict(),
+            CLAIM_DIGESTS_BY_WIT_ID: dict(),
+        },
+        BLOCKS: {
+            TOTAL_COUNT: 0,
+            TOTAL_IN_PROGRAM: 0,
+            TOTAL_OUTSIDE_PROGRAM: 0,
+            ROWS_OUTSIDE_PROGRAM: 0,
+            BY_ADDRESS: dict(),
+            BY_WIT_ID: dict(),
+        },
+        REWARDS: {
+            TOTAL: 0,
+            TOTAL_DIRECT: 0,
+            TOTAL_FROM_BLOCKS: 0,
+            BY_WIT_ID: dict(),
+            WIT_IDS_COUNT: 0,
+        }
+    }
+
+
+def ascribe_blocks_to_address(stats, address, blocks_count, *_args):
+    blocks = int(blocks_count)
+
+    # Add `blocks_count` to the existing count for an address
+    stats[BLOCKS][BY_ADDRESS][address] = stats[BLOCKS][BY_ADDRESS].get(address, 0) + blocks
+    # Increase total blocks count
+    stats[BLOCKS][TOTAL_COUNT] += blocks
+
+    # If this address belongs to a participant that submitted a valid claim, ascribe the blocks to the WIT_ID and
+    # increase the count of ascribed blocks
+    wit_id = stats[MAPS][WIT_ID_BY_ADDRESS].get(address)
+    if wit_id:
+        stats[BLOCKS][BY_WIT_ID][wit_id] = stats[BLOCKS][BY_WIT_ID].get(wit_id, 0) + blocks
+        stats[BLOCKS][TOTAL_IN_PROGRAM] += blocks
+    else:
+        stats[BLOCKS][TOTAL_OUTSIDE_PROGRAM] += blocks
+        stats[BLOCKS][ROWS_OUTSIDE_PROGRAM] += 1
+
+
+def ascribe_blocks_to_program_address(stats, address, blocks_count, *_args):
+    blocks = int(blocks_count)
+    stats[BLOCKS][TOTAL_COUNT] += blocks
+
+    # Only keep track of addresses that belong to a participant that submitted a valid claim, other addresses are only
+    # accounted for in the totals
+    wit_id = stats[MAPS][WIT_ID_BY_ADDRESS].get(address)
+    if wit_id:
+        stats[BLOCKS][BY_ADDRESS][address] = stats[BLOCKS][BY_ADDRESS].get(address, 0) + blocks
+        stats[BLOCKS][BY_WIT_ID][wit_id] = stats[BLOCKS][BY_WIT_ID].get(wit_id, 0) + blocks
+        stats[BLOCKS][TOTAL_IN_PROGRAM] += blocks
+    else:
+        stats[BLOCKS][TOTAL_OUTSIDE_PROGRAM] += blocks
+        stats[BLOCKS][ROWS_OUTSIDE_PROGRAM] += 1
+
+
+def compute_all_rewards(stats):
+    blocks_in_program = stats[BLOCKS][TOTAL_IN_PROGRAM]
+    for wit_id, blocks in stats[BLOCKS][BY_WIT_ID].items():
+        compute_reward_for_wit_id(stats, wit_id, blocks, blocks_in_program)
+
+
+def compute_reward_for_wit_id(stats, wit_id, blocks, blocks_in_program):
+    reward = round(blocks / blocks_in_program * TOTAL_TOKENS_IN_TIP * NANOWITS_PER_WIT)
+    print(f'{wit_id} mined {blocks} blocks, and will get {reward} nanowits')
+
+    # Add the reward for the wit_id and update totals
+    stats[REWARDS][BY_WIT_ID][wit_id] = stats[REWARDS][BY_WIT_ID].get(wit_id, 0) + reward
+    stats[REWARDS][TOTAL] += reward
+    stats[REWARDS][TOTAL_FROM_BLOCKS] += reward
+
+
+def copy_injections(from_dir, to_dir):
+    if os.path.isdir(from_dir):
+        for file in os.scandir(from_dir):
+            output_path = os.path.join(to_dir, file.name)
+            shutil.copyfile(file.path, output_path)
+
+
+def download_all_participants(config, stats):
+    csv_map(config.nodes_csv_file, lambda i, row: download_participant(config, stats, i, *row), skip_header=True,
+            limit=int(config.limit))
+
+
+def download_participant(config, stats, i, email, wit_id, claim_file_url, *_args, output_dir=None):
+    email = normalize_email(email)
+    stats[PARTICIPANTS][FROM_CSV][WIT_IDS].add(wit_id)
+    stats[PARTICIPANTS][FROM_CSV][EMAILS].add(email)
+    stats[MAPS][EMAIL_BY_WIT_ID][wit_id] = email
+
+    if not download_file(claim_file_url, output_dir or config.claims_output_dir, overwrite=False,
+                         prefix=f'{wit_id}_{i}'):
+        print(f'Failed to download claim file from "{claim_file_url}"')
+        return False
+
+    stats[PARTICIPANTS][DOWNLOADED][WIT_IDS].add(wit_id)
+    stats[PARTICIPANTS][DOWNLOADED][EMAILS].add(email)
+
+    return True
+
+
+async def fetch_all_participants(config, stats):
+    """
+    Download, decompress and validate the claim files of all the participants in the nodes CSV file, as a pipeline.
+
+    Every downloaded archive goes straight into a bounded decompression queue, and every decompressed claim file
+    straight into a bounded validation queue, so that network, disk and CPU work overlap. Downloads and decompressions
+    run in thread pools, while claims are validated one at a time. Which WIT_ID gets an address claimed by several of
+    them is only settled once all the claims are in, in the same order as when all the claims are validated at the end.
+    """
+    rows = []
+    csv_map(config.nodes_csv_file, lambda i, row: rows.append((i, row)), skip_header=True, limit=int(config.limit))
+
+    loop = asyncio.get_running_loop()
+    downloads = asyncio.Queue(maxsize=FETCH_QUEUE_SIZE)
+    extractions = asyncio.Queue(maxsize=FETCH_QUEUE_SIZE)
+    validations = asyncio.Queue(maxsize=FETCH_QUEUE_SIZE)
+    download_workers = int(config.download_workers)
+    extract_workers = int(config.extract_workers)
+
+    async def feed():
+        for item in rows:
+            await downloads.put(item)
+        for _ in range(download_workers):
+            await downloads.put(None)
+
+    async def download_worker(executor):
+        while True:
+            item = await downloads.get()
+            if item is None:
+                return
+            i, row = item
+            staging_dir = os.path.join(config.claims_output_dir, DOWNLOADS_DIR, f'{row[1]}_{i}')
+            if await loop.run_in_executor(executor, fetch_participant, config, stats, i, row, staging_dir):
+                await extractions.put((i, staging_dir))
+
+    async def extract_worker(executor):
+        while True:
+            item = await extractions.get()
+            if item is None:
+                return
+            i, staging_dir = item
+            for claim_file_path in await loop.run_in_executor(executor, extract_participant_claims, staging_dir,
+                                                              config.claims_output_dir, f'row_{i}'):
+                await validations.put(claim_file_path)
+
+    async def validate_worker(executor):
+        stage_by_digest = dict()
+        address_claims = []
+        while True:
+            claim_file_path = await validations.get()
+            if claim_file_path is None:
+                break
+            await loop.run_in_executor(executor, lambda: validate_claim_file(
+                stats, claim_file_path, read_file(claim_file_path), stage_by_digest, address_claims))
+        assign_claimed_addresses(stats, address_claims)
+
+    async def run_downloads(executor):
+        await asyncio.gather(*[download_worker(executor) for _ in range(download_workers)])
+        for _ in range(extract_workers):
+            await extractions.put(None)
+
+    async def run_extractions(executor):
+        await asyncio.gather(*[extract_worker(executor) for _ in range(extract_workers)])
+        await validations.put(None)
+
+    with ThreadPoolExecutor(max_workers=download_workers) as download_executor, \
+            ThreadPoolExecutor(max_workers=extract_workers) as extract_executor, \
+            ThreadPoolExecutor(max_workers=1) as validate_executor:
+        await asyncio.gather(feed(), run_downloads(download_executor), run_extractions(extract_executor),
+                             validate_worker(validate_executor))
+
+
+def fetch_participant(config, stats, i, row, staging_dir) -> bool:
+    mkdirp(staging_dir)
+    try:
+        return download_participant(config, stats, i, *row, output_dir=staging_dir)
+    except OSError as error:
+        print(f'Failed to download claim file from "{row[2]}": {error}')
+        return False
+
+
+def extract_participant_claims(staging_dir, claims_output_dir, namespace) -> list:
+    # Decompress next to the download, then move the claim files into the claims output dir as decompress_all_in_path
+    # would have left them there, but prefixed with the namespace of the participant, as the files of different
+    # participants can have the same names. The namespace must not contain a WIT_ID, which would then be taken for the
+    # one that submitted the claim file
+    extracted_dir = os.path.join(staging_dir, 'extracted')
+    mkdirp(extracted_dir)
+    decompress_all_in_path(staging_dir, extracted_dir)
+
+    claim_file_paths = []
+    for directory in (staging_dir, extracted_dir):
+        for path in sorted(list_files(directory, '.txt')):
+            claim_file_path = os.path.join(claims_output_dir, f'{namespace}_{os.path.basename(path)}')
+            if os.path.exists(claim_file_path):
+                print(f'Refusing to overwrite claim file "{claim_file_path}" with "{path}"')
+                continue
+            os.replace(path, claim_file_path)
+            claim_file_paths.append(claim_file_path)
+
+    return claim_file_paths
+
+
+def load_all_blocks_counts(config, stats):
+    for file in os.scandir(config.blocks_dir):
+        if file.name.endswith('.csv'):
+            load_blocks_count(stats, file.path, config.program_blocks_only)
+
+
+def load_all_direct_assignments(config, stats, index):
+    csv_map(config.direct_assignment_csv_file, lambda i, row: load_direct_assignment_for_wit_id(stats, index, *row))
+
+
+def load_blocks_count(stats, file_path, program_blocks_only=False):
+    if program_blocks_only:
+        csv_map(file_path, lambda i, row: ascribe_blocks_to_program_address(stats, *row))
+    else:
+        csv_map(file_path, lambda i, row: ascribe_blocks_to_address(stats, *row))
+
+
+def load_direct_assignment_for_wit_id(stats, index, email, wit_id, _a, _b, _c, _d, _e, _f, _g,reward):
+    wit_id = normalize_wit_id(wit_id)
+    if reward != '':
+        reward = int(reward) * NANOWITS_PER_WIT
+        # Add the directly assigned reward to the wit_id
+        if find_by_wit_id(index, wit_id) is not None:
+            stats[REWARDS][BY_WIT_ID][wit_id] = stats[REWARDS][BY_WIT_ID].get(wit_id, 0) + reward
+        else:
+            print(f'Will not directly assign {reward} nanowits to {wit_id} because of missing KYC')
+
+        # Update totals
+        stats[REWARDS][TOTAL] += reward
+        stats[REWARDS][TOTAL_DIRECT] += reward
+
+        print(f'Directly assigned {reward} nanowits to {wit_id}')
+
+    # Update email with the original signup email
+    if email:
+        stats[MAPS][EMAIL_BY_WIT_ID][wit_id] = normalize_email(email)
+        set_email(index, wit_id, normalize_email(email))
+
+
+def load_kyc(config, stats) -> dict:
+    # Build the index of participants only once, then join everything else against it
+    index = load_index(config.kyc_file)
+    for participant in index[PARTICIPANT_BY_WIT_ID].values():
+        whitelist_wit_id(stats, participant)
+
+    for wit_id, addresses in stats[MAPS][ADDRESSES_BY_WIT_ID].items():
+        for address in sorted(addresses):
+            add_address(index, wit_id, address)
+
+    return index
+
+
+def validate_all_claims(config, stats):
+    claim_files_by_digest = stats[MAPS][CLAIM_FILES_BY_DIGEST]
+    wit_ids_by_digest = dict()
+    contents_by_digest = dict()
+
+    for claim_file_path, contents in read_files(list_files(config.claims_output_dir, '.txt', include_hidden=True)):
+        wit_id, digest = register_claim_file(stats, claim_file_path, contents)
+        if digest:
+            wit_ids_by_digest.setdefault(digest, set()).add(wit_id)
+            contents_by_digest.setdefault(digest, contents)
+
+    # Validate every distinct claim only once, on behalf of all the WIT_IDs that submitted it
+    address_claims = []
+    for digest, wit_ids in sorted(wit_ids_by_digest.items()):
+        claim_file_path = min(claim_files_by_digest[digest])
+        print(f'Validating claim file "{claim_file_path}" ({len(claim_files_by_digest[digest])} copies)')
+        validate_claim(stats, claim_file_path, wit_ids, address_claims, contents_by_digest.pop(digest))
+
+    assign_claimed_addresses(stats, address_claims)
+
+
+def register_claim_file(stats, claim_file_path, contents) -> tuple:
+    file_name = os.path.basename(claim_file_path)
+    print(f'Hashing claim file "{claim_file_path}"')
+    match = CLAIM_FILE_NAME_REGEX.search(file_name)
+    wit_id = UNKNOWN
+    if match:
+        wit_id = match.group(1)
+        stats[PARTICIPANTS][DECOMPRESSED][WIT_IDS].add(wit_id)
+        print(f'\tFound a claim file for participant {wit_id}')
+    else:
+        print(f'\tCould not identify which participant submitted claim file "{claim_file_path}"')
+
+    if isinstance(contents, OSError):
+        print(f'\tFailed to read claim file "{claim_file_path}": {contents}')
+        return wit_id, None
+
+    # Take note of every file and WIT_ID that submitted the same contents
+    digest = hashlib.sha256(contents).hexdigest()
+    stats[MAPS][CLAIM_FILES_BY_DIGEST].setdefault(digest, set()).add(claim_file_path)
+    stats[MAPS][CLAIM_DIGESTS_BY_WIT_ID].setdefault(wit_id, set()).add(digest)
+
+    return wit_id, digest
+
+
+def validate_claim_file(stats, claim_file_path, contents, stage_by_digest: dict, address_claims: list):
+    # Same as validate_all_claims, but for claim files that show up one by one
+    wit_id, digest = register_claim_file(stats, claim_file_path, contents)
+    if not digest:
+        return
+
+    if digest not in stage_by_digest:
+        print(f'Validating claim file "{claim_file_path}"')
+        stage_by_digest[digest] = validate_claim(stats, claim_file_path, {wit_id}, address_claims, contents)
+        return
+
+    # The same contents were already validated for another WIT_ID, which this one now shares the outcome with
+    print(f'\tSame contents as the already validated "{min(stats[MAPS][CLAIM_FILES_BY_DIGEST][digest])}"')
+    reached = CLAIM_STAGES.index(stage_by_digest[digest])
+    for stage in (PARSED, SCHEMA):
+        if CLAIM_STAGES.index(stage) <= reached:
+            stats[PARTICIPANTS][stage][WIT_IDS].add(wit_id)
+
+
+def validate_claim(stats, claim_file_path, wit_ids, address_claims: list, contents=None) -> str:
+    # The contents are read from disk unless they have already been read. Returns the last stage reached by the claim,
+    # except for the address, which is only assigned by assign_claimed_addresses once all the claims are validated
+    if contents is None:
+        with open(claim_file_path, 'rb') as claim_file:
+            contents = claim_file.read()
+
+    try:
+        claim = parse_json(contents)
+    except ValueError:
+        print(f'\tFailed to parse JSON data from "{claim_file_path}"')
+        return DECOMPRESSED
+
+    print(f'\tSuccessfully parsed JSON data from "{claim_file_path}"')
+    stats[PARTICIPANTS][PARSED][WIT_IDS].update(wit_ids)
+
+    if not validate_claim_schema(claim):
+        print(f'\tWrong schema for claim data in "{claim_file_path}"')
+        return PARSED
+
+    print(f'\tCorrect schema for claim data in "{claim_file_path}"')
+    stats[PARTICIPANTS][SCHEMA][WIT_IDS].update(wit_ids)
+    stats[PARTICIPANTS][SCHEMA][ADDRESSES].add(claim[ADDRESS_FIELD])
+
+    # Use the WIT_ID from the file instead of the one in the file name, just in case someone messed up when claiming
+    wit_id = claim[IDENTIFIER_FIELD]
+
+    if not validate_claim_signature(claim):
+        print(f'\tInvalid signature for claim data in "{claim_file_path}"')
+        return SCHEMA
+
+    print(f'\tValid signature for claim data in "{claim_file_path}"')
+    stats[PARTICIPANTS][SIGNATURE][WIT_IDS].add(wit_id)
+    stats[PARTICIPANTS][SIGNATURE][ADDRESSES].add(claim[ADDRESS_FIELD])
+
+    if not validate_claim_address(claim):
+        print(f'\tInvalid address for claim data in "{claim_file_path}"')
+        return SIGNATURE
+
+    print(f'\tValid address for claim data in "{claim_file_path}" ("{claim[ADDRESS_FIELD]}")')
+    address_claims.append((claim_file_path, claim))
+
+    return SIGNATURE
+
+
+def assign_claimed_addresses(stats, address_claims: list):
+    # Whatever the order in which the claims were validated, an address claimed by several WIT_IDs goes to the lowest
+    for claim_file_path, claim in sorted(
+            address_claims, key=lambda item: (item[1][IDENTIFIER_FIELD], item[1][ADDRESS_FIELD], item[0])):
+        assign_claim_address(stats, claim_file_path, claim)
+
+
+def assign_claim_address(stats, claim_file_path, claim) -> str:
+    wit_id = claim[IDENTIFIER_FIELD]
+    print(f'Assigning the address of claim file "{claim_file_path}" to {wit_id}')
+
+    # Prevent an address from being claimed from multiple WIT_IDs
+    former_claimer = stats[MAPS][WIT_ID_BY_ADDRESS].get(claim[ADDRESS_FIELD])
+    if former_claimer and wit_id != former_claimer:
+        print(f'\tAddress {claim[ADDRESS_FIELD]} was already claimed by {former_claimer}')
+        return SIGNATURE
+
+    print(f'\tAddress {claim[ADDRESS_FIELD]} was unclaimed')
+    stats[PARTICIPANTS][ADDRESS][WIT_IDS].add(wit_id)
+    stats[PARTICIPANTS][ADDRESS][ADDRESSES].add(claim[ADDRESS_FIELD])
+
+    # All good then. Finally take note of address <> wit_id relation
+    stats[MAPS][ADDRESSES_BY_WIT_ID].setdefault(wit_id, set()).add(claim[ADDRESS_FIELD])
+    stats[MAPS][WIT_ID_BY_ADDRESS][claim[ADDRESS_FIELD]] = wit_id
+
+    return ADDRESS
+
+
+def validate_claim_address(claim) -> bool:
+    derived = derive_address_from_public_key(claim[PUBLIC_KEY_FIELD])
+
+    return derived == claim[ADDRESS_FIELD]
+
+
+def validate_claim_schema(claim) -> bool:
+    return isinstance(claim, dict) \
+           and isinstance(claim[ADDRESS_FIELD], str) \
+           and len(claim[ADDRESS_FIELD]) == 43 \
+           and CLAIM_ADDRESS_REGEX.search(claim[ADDRESS_FIELD]) \
+           and isinstance(claim[IDENTIFIER_FIELD], str) \
+           and len(claim[IDENTIFIER_FIELD]) == 9 \
+           and CLAIM_IDENTIFIER_REGEX.search(claim[IDENTIFIER_FIELD]) \
+           and isinstance(claim[PUBLIC_KEY_FIELD], str) \
+           and len(claim[PUBLIC_KEY_FIELD]) == 66 \
+           and isinstance(claim[SIGNATURE_FIELD], str) \
+           and len(claim[SIGNATURE_FIELD]) == 128
+
+
+def validate_claim_signature(claim) -> bool:
+    try:
+        return validate_secp256k1_signature(claim[SIGNATURE_FIELD], claim[IDENTIFIER_FIELD], claim[PUBLIC_KEY_FIELD])
+    except:
+        return False
+
+
+def whitelist_wit_id(stats, participant):
+    wit_id = participant[WIT_ID_FIELD]
+
+    stats[PARTICIPANTS][KYC][WIT_IDS].add(wit_id)
+    stats[PARTICIPANTS][KYC][EMAILS].update(participant[EMAILS_FIELD])
+
+    # Take note of WIT_ID <> email and WIT_ID <> name relation
+    stats[MAPS][EMAIL_BY_WIT_ID].setdefault(wit_id, participant[EMAIL_FIELD])
+    stats[MAPS][NAME_BY_WIT_ID][wit_id] = participant[NAME_FIELD]
+
+    print(f'{wit_id} ({participant[NAME_FIELD]}) passed KYC with email "{participant[EMAIL_FIELD]}"')
+
+
+def compute_assignments(stats) -> list:
+    # One row per rewarded WIT_ID, with the same columns as the assignment CSV files read by stage 2
+    assignments = []
+    for wit_id, reward in stats[REWARDS][BY_WIT_ID].items():
+        email = stats[MAPS][EMAIL_BY_WIT_ID].get(wit_id)
+        name = stats[MAPS][NAME_BY_WIT_ID].get(wit_id)
+        if email:
+            secret = generate_random_string(32)
+            print(f'Will be assigning {reward} nanowits to {wit_id}, using email "{email}" and secret "{secret}" for the participant proof')
+            assignments.append([email, name, '', reward, 'tip', secret])
+        else:
+            print(f'Tried to assign {reward} nanowits to {wit_id} but cannot find their email')
+
+    return assignments
+
+
+def write_assignments(config, stats) -> list:
+    assignments = compute_assignments(stats)
+    with open(config.output_file, 'w') as output_file:
+        output_file.write(f'email_address,name,usd,nanowit,source,secret\n')
+        for email, name, usd, reward, source, secret in assignments:
+            output_file.write(f'{email},{name},{usd},{reward},{source},{secret}\n')
+
+    return assignments
+
+
+def compute_results(stats) -> dict:
+    # One row per WIT_ID that was seen anywhere, in columns
+    stages = [stage for stage in CLAIM_STAGES if stats[PARTICIPANTS][stage][WIT_IDS]]
+    wit_ids = sorted(set().union(
+        *[stats[PARTICIPANTS][stage][WIT_IDS] for stage in CLAIM_STAGES + [KYC]],
+        stats[MAPS][EMAIL_BY_WIT_ID], stats[REWARDS][BY_WIT_ID], stats[BLOCKS][BY_WIT_ID]).difference({UNKNOWN}))
+
+    return {
+        'wit_id': wit_ids,
+        'email': [stats[MAPS][EMAIL_BY_WIT_ID].get(wit_id) for wit_id in wit_ids],
+        'name': [stats[MAPS][NAME_BY_WIT_ID].get(wit_id) for wit_id in wit_ids],
+        'blocks': [stats[BLOCKS][BY_WIT_ID].get(wit_id, 0) for wit_id in wit_ids],
+        'reward': [stats[REWARDS][BY_WIT_ID].get(wit_id, 0) for wit_id in wit_ids],
+        'addresses': [sorted(stats[MAPS][ADDRESSES_BY_WIT_ID].get(wit_id, ())) for wit_id in wit_ids],
+        'stage_reached': [next((stage for stage in reversed(stages) if wit_id in stats[PARTICIPANTS][stage][WIT_IDS]),
+                               None) for wit_id in wit_ids],
+        'passed_kyc': [wit_id in stats[PARTICIPANTS][KYC][WIT_IDS] for wit_id in wit_ids],
+    }
+
+
+def write_stats(config, stats):
+    # Stream the stats instead of building them as a single string, as they contain every WIT_ID and address
+    if config.stats_file:
+        with open(config.stats_file, 'w') as stats_file:
+            json.dump(stats, stats_file, indent=4, cls=SetEncoder)
+            stats_file.write('\n')
+        print(f'Stats written to {config.stats_file}')
+    else:
+        json.dump(stats, sys.stdout, indent=4, cls=SetEncoder)
+        print()
+
+
+def main(config) -> tuple:
+    # Create output dir if it doesn't exist
+    mkdirp(config.claims_output_dir)
+
+    stats = init_stats()
+
+    # Main procedures
+    #download_all_participants(config, stats)
+    #copy_injections('./tip/manual_claims', config.claims_output_dir)
+    #decompress_all_in_path(config.claims_output_dir, config.claims_output_dir)
+    if config.fetch_claims:
+        asyncio.run(fetch_all_participants(config, stats))
+    else:
+        validate_all_claims(config, stats)
+    index = load_kyc(config, stats)
+
+    # Compute statistics
+    stats[PARTICIPANTS][FROM_CSV][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][FROM_CSV][WIT_IDS])
+    stats[PARTICIPANTS][DOWNLOADED][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][DOWNLOADED][WIT_IDS])
+    stats[PARTICIPANTS][DOWNLOADED][MISSING_WIT_IDS] = stats[PARTICIPANTS][FROM_CSV][WIT_IDS].difference(
+        stats[PARTICIPANTS][DOWNLOADED][WIT_IDS])
+    stats[PARTICIPANTS][DOWNLOADED][MISSING_WIT_IDS] = stats[PARTICIPANTS][FROM_CSV][EMAILS].difference(
+        stats[PARTICIPANTS][DOWNLOADED][EMAILS])
+    stats[PARTICIPANTS][DECOMPRESSED][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][DECOMPRESSED][WIT_IDS])
+    stats[PARTICIPANTS][DECOMPRESSED][MISSING_WIT_IDS] = stats[PARTICIPANTS][DOWNLOADED][WIT_IDS].difference(
+        stats[PARTICIPANTS][DECOMPRESSED][WIT_IDS])
+    stats[PARTICIPANTS][PARSED][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][PARSED][WIT_IDS])
+    stats[PARTICIPANTS][PARSED][MISSING_WIT_IDS] = stats[PARTICIPANTS][DECOMPRESSED][WIT_IDS].difference(
+        stats[PARTICIPANTS][PARSED][WIT_IDS])
+    stats[PARTICIPANTS][SCHEMA][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][SCHEMA][WIT_IDS])
+    stats[PARTICIPANTS][SCHEMA][ADDRESSES_COUNT] = len(stats[PARTICIPANTS][SCHEMA][ADDRESSES])
+    stats[PARTICIPANTS][SCHEMA][MISSING_WIT_IDS] = stats[PARTICIPANTS][PARSED][WIT_IDS].difference(
+        stats[PARTICIPANTS][SCHEMA][WIT_IDS])
+    stats[PARTICIPANTS][SIGNATURE][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][SIGNATURE][WIT_IDS])
+    stats[PARTICIPANTS][SIGNATURE][ADDRESSES_COUNT] = len(stats[PARTICIPANTS][SIGNATURE][ADDRESSES])
+    stats[PARTICIPANTS][SIGNATURE][MISSING_WIT_IDS] = stats[PARTICIPANTS][SCHEMA][WIT_IDS].difference(
+        stats[PARTICIPANTS][SIGNATURE][WIT_IDS])
+    stats[PARTICIPANTS][SIGNATURE][MISSING_ADDRESSES] = stats[PARTICIPANTS][SCHEMA][ADDRESSES].difference(
+        stats[PARTICIPANTS][SIGNATURE][ADDRESSES])
+    stats[PARTICIPANTS][ADDRESS][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][ADDRESS][WIT_IDS])
+    stats[PARTICIPANTS][ADDRESS][ADDRESSES_COUNT] = len(stats[PARTICIPANTS][ADDRESS][ADDRESSES])
+    stats[PARTICIPANTS][ADDRESS][MISSING_WIT_IDS] = stats[PARTICIPANTS][SIGNATURE][WIT_IDS].difference(
+        stats[PARTICIPANTS][ADDRESS][WIT_IDS])
+    stats[PARTICIPANTS][ADDRESS][MISSING_ADDRESSES] = stats[PARTICIPANTS][SIGNATURE][ADDRESSES].difference(
+        stats[PARTICIPANTS][ADDRESS][ADDRESSES])
+    stats[PARTICIPANTS][KYC][WIT_IDS_COUNT] = len(stats[PARTICIPANTS][KYC][WIT_IDS])
+    stats[PARTICIPANTS][KYC][MISSING_WIT_IDS] = stats[PARTICIPANTS][ADDRESS][WIT_IDS].difference(
+        stats[PARTICIPANTS][KYC][WIT_IDS])
+    stats[PARTICIPANTS][KYC][MISSING_EMAILS] = stats[PARTICIPANTS][FROM_CSV][EMAILS].difference(
+        stats[PARTICIPANTS][KYC][EMAILS])
+
+    # Load block counts from blocks count CSV files
+    load_all_blocks_counts(config, stats)
+
+    # Load directly assigned rewards
+    load_all_direct_assignments(config, stats, index)
+
+    # Keep the index of participants, with their final email addresses and claimed addresses, for later runs
+    if config.participants_file:
+        save_index(index, config.participants_file)
+        print(f'Index of {len(index[PARTICIPANT_BY_WIT_ID])} participants written to {config.participants_file}')
+
+    # Calculate how many tokens should each participant get
+    compute_all_rewards(stats)
+
+    # Write token assignments into the output CSV file
+    assignments = write_assignments(config, stats)
+
+    # Export the per WIT_ID results for downstream tooling
+    if config.results_file:
+        results = compute_results(stats)
+        write_table(config.results_file, results, config.results_format)
+        print(f'Results for {len(results["wit_id"])} WIT_IDs written to {config.results_file}')
+
+    write_stats(config, stats)
+
+    return stats, assignments
+
@@ -0,0 +1,116 @@
+"""
+Index of the participants that passed KYC, built once from the KYC CSV file.
+
+Every participant is stored under their WIT_ID, and can also be found by any of their email addresses or by any of the
+addresses that they claimed. A WIT_ID that passed KYC more than once with different email addresses keeps all of them,
+and the first one is their email address until their signup email replaces it. Email addresses are always normalized
+the same way before being stored or looked up. The index is plain JSON data, so that it can be saved and loaded again in
+later runs instead of the KYC CSV file.
+"""
+import json
+
+from helpers import csv_map
+
+PARTICIPANT_BY_WIT_ID = 'participant_by_wit_id'
+WIT_ID_BY_EMAIL = 'wit_id_by_email'
+WIT_ID_BY_ADDRESS = 'wit_id_by_address'
+
+WIT_ID_FIELD = 'wit_id'
+EMAIL_FIELD = 'email'
+EMAILS_FIELD = 'emails'
+NAME_FIELD = 'name'
+ADDRESSES_FIELD = 'addresses'
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def normalize_wit_id(wit_id: str) -> str:
+    wit_id = wit_id.strip()
+
+    return wit_id if wit_id.startswith('WIT_') else f'WIT_{wit_id}'
+
+
+def init_index() -> dict:
+    return {
+        PARTICIPANT_BY_WIT_ID: dict(),
+        WIT_ID_BY_EMAIL: dict(),
+        WIT_ID_BY_ADDRESS: dict(),
+    }
+
+
+def add_participant(index: dict, wit_id: str, email: str, name: str) -> dict:
+    # A WIT_ID that passed KYC more than once keeps its first email address along with the others, and gets the latest
+    # name
+    participant = index[PARTICIPANT_BY_WIT_ID].setdefault(
+        wit_id, {WIT_ID_FIELD: wit_id, EMAIL_FIELD: email, EMAILS_FIELD: [], NAME_FIELD: name, ADDRESSES_FIELD: []})
+    participant[NAME_FIELD] = name
+    if email and email not in participant[EMAILS_FIELD]:
+        if participant[EMAILS_FIELD]:
+            print(f'{wit_id} passed KYC again with email "{email}", keeping it along with "{participant[EMAIL_FIELD]}"')
+        else:
+            participant[EMAIL_FIELD] = email
+        participant[EMAILS_FIELD].append(email)
+        index[WIT_ID_BY_EMAIL].setdefault(email, wit_id)
+
+    return participant
+
+
+def add_address(index: dict, wit_id: str, address: str):
+    participant = index[PARTICIPANT_BY_WIT_ID].get(wit_id)
+    if participant is not None and address not in index[WIT_ID_BY_ADDRESS]:
+        participant[ADDRESSES_FIELD].append(address)
+        index[WIT_ID_BY_ADDRESS][address] = wit_id
+
+
+def set_email(index: dict, wit_id: str, email: str):
+    # A former email address that did not come from KYC no longer leads to the participant, unless it belongs to another
+    # one
+    participant = index[PARTICIPANT_BY_WIT_ID].get(wit_id)
+    if participant is not None:
+        former_email = normalize_email(participant[EMAIL_FIELD] or '')
+        if former_email not in participant[EMAILS_FIELD] and index[WIT_ID_BY_EMAIL].get(former_email) == wit_id:
+            index[WIT_ID_BY_EMAIL].pop(former_email)
+        participant[EMAIL_FIELD] = normalize_email(email)
+        index[WIT_ID_BY_EMAIL][participant[EMAIL_FIELD]] = wit_id
+
+
+def find_by_wit_id(index: dict, wit_id: str):
+    return index[PARTICIPANT_BY_WIT_ID].get(wit_id)
+
+
+def find_by_email(index: dict, email: str):
+    return index[PARTICIPANT_BY_WIT_ID].get(index[WIT_ID_BY_EMAIL].get(normalize_email(email)))
+
+
+def find_by_address(index: dict, address: str):
+    return index[PARTICIPANT_BY_WIT_ID].get(index[WIT_ID_BY_ADDRESS].get(address))
+
+
+def add_kyc_row(index: dict, first_name, last_name, email, _nationality, wallet_address, _email_match, correct_email,
+                wit_id, *_args) -> dict:
+    return add_participant(index, normalize_wit_id(wit_id or wallet_address), normalize_email(email or correct_email),
+                           f'{first_name} {last_name}' if last_name else first_name)
+
+
+def load_kyc_index(kyc_file_path: str) -> dict:
+    index = init_index()
+    csv_map(kyc_file_path, lambda i, row: add_kyc_row(index, *row), skip_header=True)
+
+    return index
+
+
+def load_index(path: str) -> dict:
+    # Either a KYC CSV file, or an index that was saved before
+    if path.endswith('.json'):
+        with open(path) as index_file:
+            return json.load(index_file)
+
+    return load_kyc_index(path)
+
+
+def save_index(index: dict, path: str):
+    with open(path, 'w') as index_file:
+        json.dump(index, index_file, indent=4)
+        index_file.write('\n')
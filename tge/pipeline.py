@@ -0,0 +1,133 @@
+import argparse
+import os
+
+from tge import nodes_to_assignments, assignments_to_participant_proofs, claiming_files_to_genesis_block
+
+
+def stage_1_config(config) -> argparse.Namespace:
+    return argparse.Namespace(
+        nodes_csv_file=config.nodes_csv_file,
+        direct_assignment_csv_file=config.direct_assignment_csv_file,
+        kyc_file=config.kyc_file,
+        claims_output_dir=config.claims_output_dir,
+        blocks_dir=config.blocks_dir,
+        output_file=os.path.join(config.assignments_dir, 'tip.csv'),
+        limit=config.limit,
+        fetch_claims=config.fetch_claims,
+        download_workers=config.download_workers,
+        extract_workers=config.extract_workers,
+        program_blocks_only=config.program_blocks_only,
+        participants_file=config.participants_file,
+        stats_file=config.tip_stats_file,
+        results_file=config.tip_results_file,
+        results_format=config.tip_results_format)
+
+
+def stage_2_config(config) -> argparse.Namespace:
+    return argparse.Namespace(
+        assignments_dir=config.assignments_dir,
+        output_dir=config.proofs_dir,
+        key=config.key,
+        preview_schedules=config.preview_schedules,
+        bundle=config.proofs_bundle,
+        resume=config.resume_proofs)
+
+
+def stage_3_config(config) -> argparse.Namespace:
+    return argparse.Namespace(
+        participant_proofs_dir=config.proofs_dir,
+        claim_files_dir=config.claim_files_dir,
+        write_genesis_block=config.write_genesis_block,
+        write_manifest=config.write_manifest,
+        genesis_workers=config.genesis_workers,
+        consolidate_utxos=config.consolidate_utxos,
+        max_chunk_entries=config.max_chunk_entries,
+        validator=config.validator)
+
+
+def run_pipeline(config) -> dict:
+    """
+    Run the three stages one after the other in this process.
+
+    Stage 1 still writes its assignments CSV file and stage 2 still writes the participant proof files, but the next
+    stage gets them in memory instead of reading them back from disk.
+    """
+    stage_1 = stage_1_config(config)
+    tip_stats, tip_assignments = nodes_to_assignments.main(stage_1)
+
+    # The TIP assignments CSV file that stage 1 just wrote is skipped, as its rows are handed over directly
+    proofs_stats, participant_proofs = assignments_to_participant_proofs.main(
+        stage_2_config(config), assignments=tip_assignments, exclude=[stage_1.output_file])
+
+    genesis_state = claiming_files_to_genesis_block.main(stage_3_config(config), participant_proofs=participant_proofs)
+
+    return {
+        'tip': tip_stats,
+        'proofs': proofs_stats,
+        'genesis': genesis_state,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='run all the stages of the token generation event in a single process, from the TIP node claims '
+                    'to the genesis block')
+    parser.add_argument('nodes_csv_file',
+                        help='input nodes list CSV file')
+    parser.add_argument('direct_assignment_csv_file',
+                        help='direct rewards assignment CSV file')
+    parser.add_argument('kyc_file',
+                        help='KYC whitelist CSV file, or an index of participants saved by --participants-file')
+    parser.add_argument('claim_files_dir',
+                        help='folder containing the genesis participant claiming files')
+    parser.add_argument('--key', required=True,
+                        help='secp256k1 private key used for signing, in openssl .pem format')
+    parser.add_argument('--claims-output-dir', default='tip/claims',
+                        help='where to write the node claims JSON files (default: "%(default)s")')
+    parser.add_argument('--blocks-dir', default='tip/blocks',
+                        help='where to find CSV file containing block counts by identity (default: "%(default)s")')
+    parser.add_argument('--assignments-dir', default='assignments',
+                        help='directory containing the assignment CSV files of the other sources, where the TIP '
+                             'assignments will also be written (default: "%(default)s")')
+    parser.add_argument('--proofs-dir', default='proofs',
+                        help='where to write the participant proof files (default: "%(default)s")')
+    parser.add_argument('--proofs-bundle', default=None,
+                        help='write the participant proofs into this single SQLite file instead of the proofs '
+                             'directory (default: one file per participant)')
+    parser.add_argument('--resume-proofs', action='store_true',
+                        help='keep the participant proofs that an interrupted run already wrote, instead of signing '
+                             'them again (note that TIP secrets are generated anew on every run)')
+    parser.add_argument('--write-genesis-block', metavar='GENESIS_BLOCK_PATH', default='genesis_block.json',
+                        help='write the genesis block to this JSON file (default: "%(default)s")')
+    parser.add_argument('--write-manifest', metavar='MANIFEST_PATH', default=None,
+                        help='where to write the manifest of the genesis block (default: next to the genesis block)')
+    parser.add_argument('--genesis-workers', default=4,
+                        help='how many processes serialize the chunks of the genesis block (default: %(default)s)')
+    parser.add_argument('--consolidate-utxos', action='store_true',
+                        help='merge the genesis UTXOs with the same address and timelock')
+    parser.add_argument('--max-chunk-entries', default=0,
+                        help='maximum UTXOs per genesis block chunk (default: unlimited)')
+    parser.add_argument('--validator', choices=sorted(claiming_files_to_genesis_block.VALIDATORS), default='node',
+                        help='how to validate claiming files (default: "%(default)s")')
+    parser.add_argument('--preview-schedules', action='store_true',
+                        help='include in the stats how many nanowits get unlocked at every timelock')
+    parser.add_argument('--fetch-claims', action='store_true',
+                        help='download, decompress and validate the TIP claim files listed in the nodes CSV file')
+    parser.add_argument('--download-workers', default=8,
+                        help='how many claim files to download at once (default: %(default)s)')
+    parser.add_argument('--extract-workers', default=4,
+                        help='how many claim archives to decompress at once (default: %(default)s)')
+    parser.add_argument('--program-blocks-only', action='store_true',
+                        help='only keep per address block counts for addresses claimed by TIP participants')
+    parser.add_argument('--participants-file', default=None,
+                        help='where to save the index of participants that passed KYC (default: do not save)')
+    parser.add_argument('--tip-stats-file', default=None,
+                        help='where to write the TIP stats JSON file (default: standard output)')
+    parser.add_argument('--tip-results-file', default=None,
+                        help='where to export the TIP results of every WIT_ID (default: do not export)')
+    parser.add_argument('--tip-results-format', choices=['ndjson', 'parquet', 'arrow'], default='ndjson',
+                        help='format of the TIP results file (default: "%(default)s")')
+    parser.add_argument('--limit', default=0,
+                        help='limit how many WIT_IDs to read from the nodes CSV file (default: unlimited)')
+    args = parser.parse_args()
+    run_pipeline(args)
@@ -0,0 +1,103 @@
+"""
+Single SQLite file holding all the participant proofs, as an alternative to writing one file per participant.
+
+Every proof is stored under the name that its file would have, next to the email address and source that it belongs
+to, so that stage 3 can look proofs up without scanning a directory and any of them can be exported back into a file.
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+from helpers import mkdirp
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS proofs (
+    file_name TEXT PRIMARY KEY,
+    email_address TEXT NOT NULL,
+    source TEXT NOT NULL,
+    proof TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS proofs_by_email_address ON proofs (email_address);
+'''
+
+
+def is_bundle(path: str) -> bool:
+    return os.path.isfile(path)
+
+
+def open_bundle(path: str) -> sqlite3.Connection:
+    bundle = sqlite3.connect(path)
+    bundle.executescript(SCHEMA)
+
+    return bundle
+
+
+def serialize_proof(proof: dict) -> str:
+    # Same formatting as the proof files, so that exported files are identical to the ones written by stage 2
+    return json.dumps(proof, indent=4, ensure_ascii=False) + '\n'
+
+
+def write_proof(bundle: sqlite3.Connection, file_name: str, proof: dict):
+    bundle.execute('INSERT OR REPLACE INTO proofs VALUES (?, ?, ?, ?)',
+                   (file_name, proof['data']['email_address'], proof['data']['source'], serialize_proof(proof)))
+
+
+def count_proofs(bundle: sqlite3.Connection) -> int:
+    return bundle.execute('SELECT COUNT(*) FROM proofs').fetchone()[0]
+
+
+def read_participations(bundle: sqlite3.Connection):
+    # Only the index, without parsing any proof
+    yield from bundle.execute('SELECT file_name, email_address, source FROM proofs')
+
+
+def read_proof(bundle: sqlite3.Connection, file_name: str):
+    row = bundle.execute('SELECT proof FROM proofs WHERE file_name = ?', (file_name,)).fetchone()
+
+    return json.loads(row[0]) if row else None
+
+
+def read_proofs_by_email(bundle: sqlite3.Connection, email_address: str) -> list:
+    return [(file_name, json.loads(proof)) for file_name, proof
+            in bundle.execute('SELECT file_name, proof FROM proofs WHERE email_address = ?', (email_address,))]
+
+
+def read_proofs(bundle: sqlite3.Connection):
+    for file_name, proof in bundle.execute('SELECT file_name, proof FROM proofs'):
+        yield file_name, json.loads(proof)
+
+
+def export_proofs(bundle: sqlite3.Connection, output_dir: str, email_addresses=None) -> list:
+    mkdirp(output_dir)
+    rows = bundle.execute('SELECT file_name, email_address, proof FROM proofs')
+    paths = []
+    for file_name, email_address, proof in rows:
+        if email_addresses is not None and email_address not in email_addresses:
+            continue
+        path = os.path.join(output_dir, file_name)
+        with open(path, 'w') as proof_file:
+            proof_file.write(proof)
+        paths.append(path)
+
+    return paths
+
+
+def main(config):
+    bundle = open_bundle(config.bundle)
+    paths = export_proofs(bundle, config.output_dir, set(config.email) if config.email else None)
+    bundle.close()
+    print(f'Exported {len(paths)} participant proof files into "{config.output_dir}"')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='export participant proof files out of a bundle written by stage 2, e.g. for distributing them')
+    parser.add_argument('bundle',
+                        help='participant proofs bundle file')
+    parser.add_argument('--output-dir', default='proofs',
+                        help='where to write the proof files (default: "%(default)s")')
+    parser.add_argument('--email', action='append',
+                        help='only export the proofs of this email address, can be repeated (default: all)')
+    args = parser.parse_args()
+    main(args)
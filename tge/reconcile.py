@@ -0,0 +1,358 @@
+"""
+Reconciliation of the outputs of all the stages, to tell how many participants made it through every step and where
+the rest were lost, along with the value assigned, claimed and included in the genesis block for every source.
+
+Every output is loaded only once. WIT_IDs and email addresses are then numbered, and every step of the funnel becomes a
+bitset over those numbers, so that following participants from one step to the next is a single AND per step and the
+ones that were lost a single AND NOT, no matter how many participants there are.
+
+The TIP funnel follows WIT_IDs through stage 1 (CSV, downloaded, parsed, signed and KYC), and then their email addresses
+through stage 2 (proof) and stage 3 (claimed and included in the genesis block). Those email addresses are joined back
+to WIT_IDs through the index of participants saved by stage 1, when there is one, so that a participant is still
+followed when the proof or claim carries another of their email addresses. The funnel of every source only covers the
+last three steps, by email address.
+"""
+import argparse
+import json
+import os
+
+from helpers import csv_map, list_files, load_json_files, parse_json, read_file
+from tge.genesis import UTXOS, VALUE, manifest_path_for, read_manifest
+from tge.nodes_to_assignments import PARTICIPANTS, MAPS, FROM_CSV, DOWNLOADED, PARSED, SIGNATURE, KYC, WIT_IDS, \
+    EMAIL_BY_WIT_ID, UNKNOWN
+from tge.participants import WIT_ID_BY_EMAIL, load_index, normalize_email
+from tge.proof_bundle import is_bundle, open_bundle, read_proofs
+
+CSV = 'csv'
+DOWNLOADED_STEP = 'downloaded'
+PARSED_STEP = 'parsed'
+SIGNED = 'signed'
+KYC_STEP = 'kyc'
+PROOF = 'proof'
+CLAIMED = 'claimed'
+GENESIS = 'genesis'
+
+# Steps of the TIP funnel that come out of the stats of stage 1, in order
+TIP_STEPS = [(CSV, FROM_CSV), (DOWNLOADED_STEP, DOWNLOADED), (PARSED_STEP, PARSED), (SIGNED, SIGNATURE),
+             (KYC_STEP, KYC)]
+# Steps of the funnel of every source, in order
+SOURCE_STEPS = [PROOF, CLAIMED, GENESIS]
+
+SOURCE_TIP = 'tip'
+
+COUNT = 'count'
+LOST = 'lost'
+SAMPLE = 'sample'
+
+ASSIGNED_VALUE = 'assigned_value'
+PROOF_VALUE = 'proof_value'
+CLAIMED_VALUE = 'claimed_value'
+GENESIS_VALUE = 'genesis_value'
+UNCLAIMED_VALUE = 'unclaimed_value'
+
+FIELD_DATA = 'data'
+FIELD_EMAIL_ADDRESS = 'email_address'
+FIELD_SOURCE = 'source'
+FIELD_WIT = 'wit'
+FIELD_ADDRESSES = 'addresses'
+FIELD_ADDRESS = 'address'
+FIELD_AMOUNT = 'amount'
+FIELD_ALLOC = 'alloc'
+FIELD_VALUE = 'value'
+
+
+def number_keys(*key_sets) -> tuple:
+    # Sorted, so that the members of any bitset come out sorted too
+    keys = sorted(set().union(*key_sets))
+
+    return keys, {key: i for i, key in enumerate(keys)}
+
+
+def to_bitset(keys, position_by_key: dict) -> int:
+    bits = bytearray((len(position_by_key) + 7) // 8)
+    for key in keys:
+        i = position_by_key.get(key)
+        if i is not None:
+            bits[i >> 3] |= 1 << (i & 7)
+
+    return int.from_bytes(bits, 'little')
+
+
+def count_bitset(bitset: int) -> int:
+    return bin(bitset).count('1')
+
+
+def bitset_members(bitset: int, keys: list, limit: int) -> list:
+    # The lowest bits first, which are the first keys in order
+    members = []
+    while bitset and len(members) < limit:
+        lowest = bitset & -bitset
+        members.append(keys[lowest.bit_length() - 1])
+        bitset ^= lowest
+
+    return members
+
+
+def compute_funnel(steps: list, keys: list, samples: int) -> dict:
+    """
+    Follow the keys through (step, bitset) pairs, in order. A step without a bitset has no output to compare against
+    and is skipped.
+
+    Returns, for every step, how many keys made it up to there, and how many of the ones in the previous step did not,
+    along with some of them.
+    """
+    funnel = dict()
+    remaining = None
+    for step, bitset in steps:
+        if bitset is None:
+            funnel[step] = None
+            continue
+
+        lost = 0 if remaining is None else remaining & ~bitset
+        remaining = bitset if remaining is None else remaining & bitset
+        funnel[step] = {
+            COUNT: count_bitset(remaining),
+            LOST: count_bitset(lost),
+            SAMPLE: bitset_members(lost, keys, samples),
+        }
+
+    return funnel
+
+
+def load_tip_stats(stats_file_path: str) -> tuple:
+    # WIT_IDs in every step of stage 1, and the email address of every WIT_ID
+    stats = parse_json(read_file(stats_file_path))
+    wit_ids_by_step = {step: set(stats[PARTICIPANTS][stage][WIT_IDS]).difference({UNKNOWN}) for step, stage in TIP_STEPS}
+    email_by_wit_id = {wit_id: normalize_email(email) for wit_id, email in stats[MAPS][EMAIL_BY_WIT_ID].items()
+                       if email}
+
+    return wit_ids_by_step, email_by_wit_id
+
+
+def add_assignment_row(value_by_source: dict, _email, _name, _usd, nanowit, source, *_args):
+    # Rows assigned in USD only get their value in stage 2
+    if nanowit:
+        value_by_source[source] = value_by_source.get(source, 0) + int(nanowit)
+
+
+def load_assignments(assignments_dir: str) -> dict:
+    value_by_source = dict()
+    for csv_path in list_files(assignments_dir, '.csv'):
+        csv_map(csv_path, lambda i, row: add_assignment_row(value_by_source, *row), skip_header=True)
+
+    return value_by_source
+
+
+def load_proofs(proofs_path: str) -> dict:
+    # Value of every participant proof, by source and email address, from either a directory or a bundle
+    if is_bundle(proofs_path):
+        bundle = open_bundle(proofs_path)
+        proofs = [proof for _, proof in read_proofs(bundle)]
+        bundle.close()
+    else:
+        proofs = []
+        for proof_path, proof in load_json_files(list_files(proofs_path, '.proof')):
+            if isinstance(proof, Exception):
+                raise proof
+            proofs.append(proof)
+
+    value_by_email_by_source = dict()
+    for proof in proofs:
+        data = proof[FIELD_DATA]
+        value_by_email_by_source.setdefault(data[FIELD_SOURCE], dict())[normalize_email(data[FIELD_EMAIL_ADDRESS])] = \
+            int(data[FIELD_WIT])
+
+    return value_by_email_by_source
+
+
+def load_claims(claims_dir: str) -> dict:
+    # Amount of every address claimed, by source and email address. Claim files that cannot be parsed are left out,
+    # same as stage 3 does
+    addresses_by_email_by_source = dict()
+    for claim_path, claim in load_json_files(list_files(claims_dir, '.json')):
+        if isinstance(claim, Exception):
+            print(f'Failed to load claim file "{claim_path}": {claim}')
+            continue
+        addresses_by_email_by_source.setdefault(claim[FIELD_SOURCE], dict())[
+            normalize_email(claim[FIELD_EMAIL_ADDRESS])] = [
+            (address[FIELD_ADDRESS], int(address[FIELD_AMOUNT])) for address in claim[FIELD_ADDRESSES]]
+
+    return addresses_by_email_by_source
+
+
+def load_genesis_block(genesis_block_path: str) -> tuple:
+    # Total value of every address in the genesis block, and how it compares to the manifest, if there is any
+    value_by_address = dict()
+    alloc = parse_json(read_file(genesis_block_path))[FIELD_ALLOC]
+    for chunk in alloc:
+        for utxo in chunk:
+            value_by_address[utxo[FIELD_ADDRESS]] = value_by_address.get(utxo[FIELD_ADDRESS], 0) + utxo[FIELD_VALUE]
+
+    manifest_matches = None
+    manifest_path = manifest_path_for(genesis_block_path)
+    if os.path.isfile(manifest_path):
+        manifest = read_manifest(manifest_path)
+        manifest_matches = manifest[UTXOS] == sum(len(chunk) for chunk in alloc) and \
+            manifest[VALUE] == sum(value_by_address.values())
+
+    return value_by_address, manifest_matches
+
+
+def in_genesis(addresses: list, value_by_address: dict) -> bool:
+    # A claim without any address has nothing in the genesis block
+    return bool(addresses) and all(address in value_by_address for address, _ in addresses)
+
+
+def attribute_genesis_value(claims: dict, value_by_address: dict) -> dict:
+    """
+    Split the value of the genesis block among the sources that claimed it.
+
+    Every claimed address gets at most the amount that it was claimed with, out of what is left of its value in the
+    genesis block, so that an address claimed under several sources, or several times, is never counted twice. Claims
+    are gone through by source and email address, which only matters for addresses with less value in the genesis
+    block than they were claimed with.
+    """
+    remaining_by_address = dict(value_by_address)
+    value_by_source = dict()
+    for source in sorted(claims):
+        value_by_source[source] = 0
+        for email in sorted(claims[source]):
+            for address, amount in claims[source][email]:
+                value = min(amount, remaining_by_address.get(address, 0))
+                remaining_by_address[address] = remaining_by_address.get(address, 0) - value
+                value_by_source[source] += value
+
+    return value_by_source
+
+
+def compute_sources(config, proofs: dict, claims: dict, value_by_address: dict, assigned: dict) -> dict:
+    # Funnel and value totals of every source, by email address
+    genesis_value_by_source = None if value_by_address is None else attribute_genesis_value(claims, value_by_address)
+    sources = dict()
+    for source in sorted(set(proofs).union(claims, assigned)):
+        values = proofs.get(source, dict())
+        addresses_by_email = claims.get(source, dict())
+        in_genesis_emails = None if value_by_address is None else [
+            email for email, addresses in addresses_by_email.items() if in_genesis(addresses, value_by_address)]
+
+        emails, position_by_email = number_keys(values, addresses_by_email)
+        sources[source] = compute_funnel([
+            (PROOF, to_bitset(values, position_by_email) if config.proofs else None),
+            (CLAIMED, to_bitset(addresses_by_email, position_by_email) if config.claims_dir else None),
+            (GENESIS, None if in_genesis_emails is None else to_bitset(in_genesis_emails, position_by_email)),
+        ], emails, int(config.samples))
+
+        claimed_addresses = [address for addresses in addresses_by_email.values() for address in addresses]
+        genesis_value = None if value_by_address is None else genesis_value_by_source.get(source, 0)
+        proof_value = sum(values.values()) if config.proofs else None
+        sources[source].update({
+            ASSIGNED_VALUE: assigned.get(source) if config.assignments_dir else None,
+            PROOF_VALUE: proof_value,
+            CLAIMED_VALUE: sum(amount for _, amount in claimed_addresses) if config.claims_dir else None,
+            GENESIS_VALUE: genesis_value,
+            UNCLAIMED_VALUE: None if proof_value is None or genesis_value is None else proof_value - genesis_value,
+        })
+
+    return sources
+
+
+def map_wit_ids_by_email(email_by_wit_id: dict, index) -> dict:
+    # Every WIT_ID that an email address leads to, from the stats of stage 1 and the index of participants if any
+    wit_ids_by_email = dict()
+    for wit_id, email in email_by_wit_id.items():
+        wit_ids_by_email.setdefault(email, set()).add(wit_id)
+    if index is not None:
+        for email, wit_id in index[WIT_ID_BY_EMAIL].items():
+            wit_ids_by_email.setdefault(email, set()).add(wit_id)
+
+    return wit_ids_by_email
+
+
+def compute_tip_funnel(config, wit_ids_by_step: dict, email_by_wit_id: dict, proofs: dict, claims: dict,
+                       value_by_address: dict, index=None) -> dict:
+    # Stage 2 and 3 only know email addresses, so those steps are mapped back to WIT_IDs
+    tip_values = proofs.get(SOURCE_TIP, dict())
+    tip_claims = claims.get(SOURCE_TIP, dict())
+    wit_ids, position_by_wit_id = number_keys(*wit_ids_by_step.values(), email_by_wit_id)
+    wit_ids_by_email = map_wit_ids_by_email(email_by_wit_id, index)
+
+    def by_email(emails):
+        return to_bitset((wit_id for email in emails for wit_id in wit_ids_by_email.get(email, ())),
+                         position_by_wit_id)
+
+    # Stage 1 steps that were not run have no WIT_IDs at all
+    steps = [(step, to_bitset(wit_ids_by_step[step], position_by_wit_id) if wit_ids_by_step[step] else None)
+             for step, _ in TIP_STEPS]
+    steps.append((PROOF, by_email(tip_values) if config.proofs else None))
+    steps.append((CLAIMED, by_email(tip_claims) if config.claims_dir else None))
+    steps.append((GENESIS, None if value_by_address is None else by_email(
+        {email for email, addresses in tip_claims.items() if in_genesis(addresses, value_by_address)})))
+
+    return compute_funnel(steps, wit_ids, int(config.samples))
+
+
+def reconcile(config) -> dict:
+    proofs = load_proofs(config.proofs) if config.proofs else dict()
+    claims = load_claims(config.claims_dir) if config.claims_dir else dict()
+    assigned = load_assignments(config.assignments_dir) if config.assignments_dir else dict()
+    value_by_address, manifest_matches = load_genesis_block(config.genesis_block) if config.genesis_block \
+        else (None, None)
+
+    index = load_index(config.participants_file) if config.participants_file else None
+
+    report = dict()
+    if config.stats_file:
+        report[SOURCE_TIP] = compute_tip_funnel(config, *load_tip_stats(config.stats_file), proofs, claims,
+                                                value_by_address, index)
+
+    report['sources'] = compute_sources(config, proofs, claims, value_by_address, assigned)
+
+    if value_by_address is not None:
+        claimed_addresses = {address for addresses_by_email in claims.values()
+                             for addresses in addresses_by_email.values() for address, _ in addresses}
+        unclaimed_addresses = sorted(set(value_by_address).difference(claimed_addresses))
+        report[GENESIS] = {
+            'addresses': len(value_by_address),
+            VALUE: sum(value_by_address.values()),
+            'unclaimed_addresses': len(unclaimed_addresses),
+            'unclaimed_addresses_sample': unclaimed_addresses[:int(config.samples)],
+            'manifest_matches': manifest_matches,
+        }
+
+    return report
+
+
+def main(config):
+    report = reconcile(config)
+    if config.output_file:
+        with open(config.output_file, 'w') as output_file:
+            json.dump(report, output_file, indent=4)
+            output_file.write('\n')
+        print(f'Reconciliation report written to {config.output_file}')
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='follow participants through the outputs of every stage, and tell how many were lost at each step '
+                    'and how much value was assigned, claimed and included in the genesis block for every source')
+    parser.add_argument('--stats-file', default=None,
+                        help='stats file written by stage 1, for following TIP participants by WIT_ID')
+    parser.add_argument('--participants-file', default=None,
+                        help='index of participants saved by stage 1 with --participants-file, or the KYC CSV file, '
+                             'for following TIP participants by any of their email addresses')
+    parser.add_argument('--assignments-dir', default=None,
+                        help='directory with the assignment CSV files read by stage 2')
+    parser.add_argument('--proofs', default=None,
+                        help='participant proofs written by stage 2, either a directory or a bundle file')
+    parser.add_argument('--claims-dir', default=None,
+                        help='directory with the claim files read by stage 3')
+    parser.add_argument('--genesis-block', default=None,
+                        help='genesis block written by stage 3, checked against the manifest next to it if any')
+    parser.add_argument('--samples', default=5,
+                        help='how many of the participants lost at every step to list (default: %(default)s)')
+    parser.add_argument('--output-file', default=None,
+                        help='where to write the report (default: print it)')
+    args = parser.parse_args()
+    main(args)
@@ -139,7 +139,11 @@ function validateFile (file, fileValidator) {
     try {
       // Rule out any mismatch that happens not in addresses
       assert.deepEqual({...err.actual, addresses: []}, {...err.expected, addresses: []})
-      return err.actual.addresses.reduce((acc, address, i) => acc && (err.expected.addresses[i].timelock - address.timelock <= 3600), true)
+      // Every expected address must be there with its exact amount, but timelocks can be up to 1h earlier (never later)
+      return err.actual.addresses.length === err.expected.addresses.length &&
+        err.actual.addresses.every((address, i) => address.amount === err.expected.addresses[i].amount &&
+          err.expected.addresses[i].timelock - address.timelock >= 0 &&
+          err.expected.addresses[i].timelock - address.timelock <= 3600)
     } catch (err) {
       console.error("DeepEqual assertion failed:", err)
       return false